@@ -0,0 +1,83 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    def __init__(self, batch_fn, max_wait=0.002, max_batch=256):
+        """
+        Agrupa las peticiones concurrentes en lotes: un hilo en segundo plano reúne los
+        elementos que llegan durante una ventana corta (max_wait segundos o max_batch
+        elementos, lo que ocurra primero), los procesa con una sola llamada a batch_fn y
+        entrega a cada llamador su resultado
+
+        batch_fn: función que recibe una lista de elementos y retorna una lista de resultados
+            del mismo tamaño y en el mismo orden
+        max_wait: tiempo máximo (segundos) que el primer elemento de un lote espera a otros
+        max_batch: número máximo de elementos por lote
+        """
+        self.batch_fn = batch_fn
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self._queue = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        """
+        Inicia el hilo del lote en el primer uso de cada proceso. Los servidores que
+        crean procesos con fork después de importar la aplicación (werkzeug con
+        processes=N, gunicorn --preload) no heredan los hilos, así que cada proceso
+        necesita su propio hilo y su propia cola.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            thread = threading.Thread(target=self._run, args=(self._queue,),
+                                      name='micro-batcher', daemon=True)
+            thread.start()
+            self._pid = os.getpid()
+
+    def submit(self, item):
+        """
+        Encola un elemento. Retorna un Future con su resultado.
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _collect(self, items_queue):
+        # Esperar indefinidamente el primer elemento; después, sólo hasta agotar la ventana
+        batch = [items_queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(items_queue.get(timeout=remaining))
+                else:
+                    # Ventana agotada: tomar sólo lo que ya está en la cola
+                    batch.append(items_queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, items_queue):
+        while True:
+            batch = self._collect(items_queue)
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+            try:
+                results = self.batch_fn(items)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, result in zip(futures, results):
+                future.set_result(result)
@@ -0,0 +1,231 @@
+import os
+import sys
+import csv
+import json
+import argparse
+import itertools
+import multiprocessing
+import time
+from collections import deque
+from inference import SentimentInference
+
+BATCH_SIZE = 5000
+
+# Columnas del CSV de Sentiment140: sentimiento, id, fecha, consulta, usuario, texto
+SENTIMENT140_TEXT_COLUMN = 5
+SENTIMENT140_ID_COLUMN = 1
+
+OUTPUT_FIELDS = ['row', 'id', 'prediction', 'confidence', 'negativo', 'positivo']
+
+
+def default_model_path():
+    # Se prefiere el formato binario: los procesos comparten las páginas mapeadas en memoria
+    if os.path.exists('models/model.bin'):
+        return 'models/model.bin'
+    return 'models/model.pkl'
+
+
+def iter_csv(file_path, text_column, id_column, encoding):
+    """
+    Genera (id, texto) por cada fila del CSV. Si las columnas se indican por nombre, la
+    primera fila se usa como encabezado. Las filas sin la columna de texto dan texto None.
+    """
+    with open(file_path, 'r', encoding=encoding, newline='') as file:
+        reader = csv.reader(file)
+        columns = [c for c in (text_column, id_column) if c is not None]
+        header = next(reader, []) if not all(c.isdigit() for c in columns) else []
+
+        def position(column):
+            if column is None:
+                return None
+            if column.isdigit():
+                return int(column)
+            if column not in header:
+                raise ValueError(f"La columna {column!r} no está en el encabezado de {file_path}")
+            return header.index(column)
+
+        text_index = position(text_column)
+        id_index = position(id_column)
+        for row in reader:
+            text = row[text_index] if text_index < len(row) else None
+            row_id = row[id_index] if id_index is not None and id_index < len(row) else None
+            yield row_id, text
+
+
+def iter_jsonl(file_path, text_field, id_field, encoding):
+    """Genera (id, texto) por cada línea de un archivo JSONL"""
+    with open(file_path, 'r', encoding=encoding) as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield None, None
+                continue
+            if not isinstance(record, dict):
+                yield None, None
+                continue
+            text = record.get(text_field)
+            yield record.get(id_field) if id_field else None, text if isinstance(text, str) else None
+
+
+def iter_batches(records, size):
+    """Agrupa los registros en listas de hasta size elementos sin leer el archivo completo"""
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+_worker_engine = None
+
+def _init_worker(model_path, preprocessor_path, cache_size):
+    global _worker_engine
+    _worker_engine = SentimentInference(model_path=model_path, preprocessor_path=preprocessor_path,
+                                        cache_size=cache_size)
+
+def _score_batch(texts):
+    """
+    Puntúa un lote de textos (en un proceso hijo). Retorna una tupla (predicción,
+    confianza, P(negativo), P(positivo)) por texto, o None si el texto no es válido.
+    """
+    valid = [i for i, text in enumerate(texts) if text is not None and text.strip()]
+    results = [None] * len(texts)
+    for i, result in zip(valid, _worker_engine.analyze_batch([texts[i] for i in valid])):
+        probabilities = result['probabilities']
+        results[i] = (result['prediction'], result['confidence'],
+                      probabilities['negativo'], probabilities['positivo'])
+    return results
+
+
+def iter_results(batches, workers, model_path, preprocessor_path, cache_size):
+    """
+    Puntúa los lotes en un grupo de procesos y genera los resultados en el orden de
+    entrada. Como máximo hay 2 * workers lotes en vuelo, así que la memoria no depende
+    del tamaño del archivo (Pool.imap, en cambio, lee toda la entrada por adelantado).
+    """
+    if workers <= 1:
+        _init_worker(model_path, preprocessor_path, cache_size)
+        for batch in batches:
+            yield batch, _score_batch([text for _, text in batch])
+        return
+
+    with multiprocessing.Pool(workers, initializer=_init_worker,
+                              initargs=(model_path, preprocessor_path, cache_size)) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append((batch, pool.apply_async(_score_batch, ([text for _, text in batch],))))
+            if len(pending) >= 2 * workers:
+                batch, result = pending.popleft()
+                yield batch, result.get()
+        while pending:
+            batch, result = pending.popleft()
+            yield batch, result.get()
+
+
+class ResultWriter:
+    def __init__(self, file, output_format):
+        """
+        Escribe los resultados en CSV (con encabezado) o en JSONL, una fila por registro
+        de entrada; los registros inválidos quedan con la predicción vacía
+        """
+        self.file = file
+        self.output_format = output_format
+        if output_format == 'csv':
+            self.writer = csv.writer(file)
+            self.writer.writerow(OUTPUT_FIELDS)
+
+    def write(self, start, batch, results):
+        for row, (row_id, _), result in zip(itertools.count(start), batch, results):
+            values = [row, row_id] + (list(result) if result is not None else [None] * 4)
+            if self.output_format == 'csv':
+                self.writer.writerow(['' if v is None else v for v in values])
+            else:
+                self.file.write(json.dumps(dict(zip(OUTPUT_FIELDS, values)), ensure_ascii=False) + '\n')
+
+
+def detect_format(path, explicit=None):
+    if explicit:
+        return explicit
+    return 'jsonl' if path.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def score_file(args):
+    input_format = detect_format(args.input, args.format)
+    output_format = detect_format(args.output, args.output_format)
+    if input_format == 'csv':
+        text_column = args.column or str(SENTIMENT140_TEXT_COLUMN)
+        id_column = args.id_column if args.id_column is not None else (
+            None if args.column else str(SENTIMENT140_ID_COLUMN))
+        records = iter_csv(args.input, text_column, id_column, args.encoding or 'latin-1')
+    else:
+        records = iter_jsonl(args.input, args.column or 'text',
+                             args.id_column if args.id_column is not None else 'id',
+                             args.encoding or 'utf-8')
+
+    size = os.path.getsize(args.input)
+    print(f"Puntuando {args.input} ({size / 1024 / 1024:.1f} MB, {input_format}) con "
+          f"{args.workers} procesos y lotes de {args.batch_size} -> {args.output} ({output_format})")
+
+    start = time.time()
+    last_report = start
+    total = invalid = 0
+    with open(args.output, 'w', encoding='utf-8', newline='') as out:
+        writer = ResultWriter(out, output_format)
+        results = iter_results(iter_batches(records, args.batch_size), args.workers,
+                              args.model, args.preprocessor, args.cache)
+        for batch, batch_results in results:
+            writer.write(total, batch, batch_results)
+            total += len(batch)
+            invalid += sum(result is None for result in batch_results)
+
+            now = time.time()
+            if now - last_report >= args.interval:
+                last_report = now
+                print(f"Procesados {total} registros ({total / (now - start):.0f} registros/s)")
+                sys.stdout.flush()
+
+    elapsed = time.time() - start
+    print(f"\nTotal: {total} registros en {elapsed:.2f} segundos "
+          f"({total / elapsed if elapsed > 0 else 0:.0f} registros/s)")
+    if invalid:
+        print(f"Registros sin texto válido: {invalid}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Puntúa el sentimiento de un archivo CSV o JSONL grande por lotes y en "
+                    "paralelo, escribiendo los resultados a medida que se obtienen")
+    parser.add_argument('input', help="Archivo de entrada (CSV o JSONL)")
+    parser.add_argument('output', help="Archivo de salida (.csv o .jsonl)")
+    parser.add_argument('--format', choices=['csv', 'jsonl'],
+                        help="Formato de entrada (por defecto según la extensión)")
+    parser.add_argument('--output-format', choices=['csv', 'jsonl'],
+                        help="Formato de salida (por defecto según la extensión)")
+    parser.add_argument('--column',
+                        help="Columna del texto: índice o nombre del encabezado en CSV, clave en "
+                             "JSONL (por defecto el formato de Sentiment140 o 'text')")
+    parser.add_argument('--id-column',
+                        help="Columna o clave del identificador que se copia a la salida")
+    parser.add_argument('--encoding', help="Codificación de la entrada (latin-1 en CSV, utf-8 en JSONL)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Número de procesos que puntúan lotes")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help="Registros por lote enviado a cada proceso")
+    parser.add_argument('--model', default=default_model_path(),
+                        help="Modelo (formato binario o pickle)")
+    parser.add_argument('--preprocessor', default='models/preprocessor.pkl',
+                        help="Preprocesador guardado por train_model.py")
+    parser.add_argument('--cache', type=int, default=10000,
+                        help="Tamaño de la caché de predicciones de cada proceso (0 la desactiva)")
+    parser.add_argument('--interval', type=float, default=5.0,
+                        help="Segundos entre reportes de progreso")
+    args = parser.parse_args()
+    if args.batch_size < 1 or args.workers < 1:
+        parser.error("--batch-size y --workers deben ser positivos")
+    return args
+
+
+if __name__ == "__main__":
+    score_file(parse_args())
@@ -0,0 +1,74 @@
+import numpy as np
+
+
+class EncodedCorpus:
+    def __init__(self, words, offsets, ids, labels):
+        """
+        Corpus preprocesado en forma compacta: cada documento es un rango de índices
+        de palabra en lugar de una lista de cadenas
+
+        words: lista de palabras; ids hace referencia a posiciones de esta lista
+        offsets: arreglo de n_documentos + 1 posiciones; el documento i es ids[offsets[i]:offsets[i + 1]]
+        ids: arreglo de índices de palabra
+        labels: arreglo con la etiqueta de cada documento
+        """
+        self.words = words
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.labels = np.asarray(labels)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    @classmethod
+    def concatenate(cls, parts):
+        """
+        Une varios corpus (cada uno con su propio vocabulario) en uno solo,
+        conservando el orden de los documentos
+        """
+        index = {}
+        ids = []
+        lengths = []
+        labels = []
+        for part in parts:
+            # Traducir el vocabulario local de cada parte al vocabulario común
+            mapping = np.fromiter((index.setdefault(word, len(index)) for word in part.words),
+                                  dtype=np.int32, count=len(part.words))
+            ids.append(mapping[part.ids])
+            lengths.append(part.lengths)
+            labels.append(part.labels)
+        words = list(index)
+
+        offsets = np.zeros(sum(len(l) for l in lengths) + 1, dtype=np.int64)
+        if lengths:
+            np.cumsum(np.concatenate(lengths), out=offsets[1:])
+        ids = np.concatenate(ids) if ids else np.zeros(0, dtype=np.int32)
+        labels = np.concatenate(labels) if labels else np.zeros(0, dtype=np.int64)
+        return cls(words, offsets, ids, labels)
+
+    def take(self, docs):
+        """
+        Devuelve un corpus con los documentos indicados, en ese orden
+
+        docs: arreglo de índices de documento
+        """
+        docs = np.asarray(docs, dtype=np.int64)
+        starts = self.offsets[docs]
+        lengths = self.offsets[docs + 1] - starts
+
+        offsets = np.zeros(len(docs) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Posición de cada palabra: inicio del documento + desplazamiento dentro de él
+        positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return EncodedCorpus(self.words, offsets, self.ids[positions], self.labels[docs])
+
+    def token_lists(self):
+        """Convierte el corpus de vuelta en listas de palabras"""
+        words = np.array(self.words, dtype=object)
+        tokens = words[self.ids].tolist()
+        offsets = self.offsets.tolist()
+        return [tokens[offsets[i]:offsets[i + 1]] for i in range(len(self))]
@@ -0,0 +1,88 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import numpy as np
+from corpus import EncodedCorpus
+
+# Cambiar si cambia el formato de los archivos de la caché
+CACHE_VERSION = 1
+
+
+def _sha256_file(path, digest=None):
+    digest = digest or hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest
+
+
+def preprocessor_fingerprint(preprocessor):
+    """
+    Huella de la configuración del preprocesador: sus stopwords y el código fuente del
+    módulo que lo define, de modo que cualquier cambio en la limpieza invalida la caché
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        'class': type(preprocessor).__qualname__,
+        'stopwords': sorted(preprocessor.stopwords),
+        'keep_stopwords': sorted(preprocessor.keep_stopwords),
+    }).encode('utf-8'))
+    _sha256_file(inspect.getfile(type(preprocessor)), digest)
+    return digest.hexdigest()
+
+
+def cache_key(dataset_path, preprocessor):
+    """
+    Clave de la caché: hash del contenido del dataset, de la configuración del
+    preprocesador y de la versión del formato
+    """
+    digest = hashlib.sha256(f'v{CACHE_VERSION}'.encode('utf-8'))
+    digest.update(_sha256_file(dataset_path).digest())
+    digest.update(preprocessor_fingerprint(preprocessor).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def save_corpus(corpus, directory):
+    """
+    Guarda un EncodedCorpus como arreglos .npy: ids (int32), offsets (int64), labels y
+    el vocabulario como bytes UTF-8 separados por saltos de línea (las palabras nunca
+    contienen espacios). Se escribe en un directorio temporal que se renombra al final,
+    así que una ejecución interrumpida no deja una caché incompleta.
+    """
+    temp_directory = f'{directory}.tmp'
+    shutil.rmtree(temp_directory, ignore_errors=True)
+    os.makedirs(temp_directory)
+
+    words = np.frombuffer('\n'.join(corpus.words).encode('utf-8'), dtype=np.uint8)
+    np.save(os.path.join(temp_directory, 'words.npy'), words)
+    np.save(os.path.join(temp_directory, 'ids.npy'), np.asarray(corpus.ids, dtype=np.int32))
+    np.save(os.path.join(temp_directory, 'offsets.npy'), np.asarray(corpus.offsets, dtype=np.int64))
+    np.save(os.path.join(temp_directory, 'labels.npy'), np.asarray(corpus.labels))
+    with open(os.path.join(temp_directory, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'version': CACHE_VERSION, 'documents': len(corpus),
+                   'words': len(corpus.words), 'tokens': int(len(corpus.ids))}, f)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(temp_directory, directory)
+
+
+def load_corpus(directory):
+    """
+    Carga un corpus guardado con save_corpus. Los ids, offsets y etiquetas se mapean en
+    memoria; retorna None si la caché no existe o es de otra versión.
+    """
+    try:
+        with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != CACHE_VERSION:
+        return None
+
+    words = np.load(os.path.join(directory, 'words.npy'))
+    words = words.tobytes().decode('utf-8').split('\n') if meta['words'] else []
+    arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+              for name in ('ids', 'offsets', 'labels')}
+    return EncodedCorpus(words, arrays['offsets'], arrays['ids'], arrays['labels'])
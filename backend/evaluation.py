@@ -0,0 +1,183 @@
+import copy
+import multiprocessing
+import time
+import numpy as np
+
+
+def confusion_matrix(y_true, y_pred, classes):
+    """
+    Calcula la matriz de confusión (filas: clase real, columnas: clase predicha) con un
+    solo np.bincount sobre los pares (real, predicha). Las etiquetas que no están en
+    classes se ignoran.
+
+    y_true: etiquetas reales
+    y_pred: etiquetas predichas
+    classes: arreglo ordenado de clases (por ejemplo, model.classes)
+    """
+    classes = np.asarray(classes)
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    n_classes = len(classes)
+    if n_classes == 0:
+        return np.zeros((0, 0), dtype=np.int64)
+
+    true_index = np.minimum(np.searchsorted(classes, y_true), n_classes - 1)
+    pred_index = np.minimum(np.searchsorted(classes, y_pred), n_classes - 1)
+    valid = (classes[true_index] == y_true) & (classes[pred_index] == y_pred)
+
+    pairs = true_index[valid] * n_classes + pred_index[valid]
+    return np.bincount(pairs, minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+
+
+def accuracy_from_confusion(cm):
+    """Exactitud: fracción de documentos en la diagonal de la matriz de confusión"""
+    total = cm.sum()
+    return float(np.trace(cm) / total) if total > 0 else 0.0
+
+
+def metrics_from_confusion(cm, classes):
+    """
+    Calcula precision, recall y f1-score por clase y su promedio (macro) a partir de
+    una matriz de confusión, con operaciones sobre sus filas y columnas
+
+    cm: matriz de confusión (filas: clase real, columnas: clase predicha)
+    classes: clases en el orden de las filas de cm
+    """
+    cm = np.asarray(cm)
+    tp = np.diag(cm).astype(np.float64)
+    predicted = cm.sum(axis=0)
+    actual = cm.sum(axis=1)
+
+    # Las divisiones entre cero valen 0, como en la versión anterior
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall = np.divide(tp, actual, out=np.zeros_like(tp), where=actual > 0)
+    denominator = precision + recall
+    f1 = np.divide(2 * precision * recall, denominator, out=np.zeros_like(tp),
+                   where=denominator > 0)
+
+    metrics = {c: {'precision': p, 'recall': r, 'f1-score': f}
+               for c, p, r, f in zip(classes, precision.tolist(), recall.tolist(), f1.tolist())}
+    metrics['avg'] = {
+        'precision': float(precision.mean()) if len(tp) else 0.0,
+        'recall': float(recall.mean()) if len(tp) else 0.0,
+        'f1-score': float(f1.mean()) if len(tp) else 0.0,
+    }
+    return metrics
+
+
+def assign_folds(n_docs, k, seed=0):
+    """
+    Reparte los índices de documento al azar en k particiones de tamaño similar (cada
+    una ordenada, para leer el corpus en orden)
+    """
+    order = np.random.default_rng(seed).permutation(n_docs)
+    return [np.sort(fold) for fold in np.array_split(order, k)]
+
+
+def stratified_holdout(labels, fraction, seed=0):
+    """
+    Reserva al azar la fracción indicada de los documentos de cada clase, de modo que
+    el conjunto reservado conserva la proporción de clases aunque el corpus esté
+    ordenado por etiqueta
+
+    Retorna (resto, reservados) como arreglos ordenados de índices de documento
+    """
+    labels = np.asarray(labels)
+    rng = np.random.default_rng(seed)
+    held = [rng.permutation(np.flatnonzero(labels == c))[:int(round(np.sum(labels == c) * fraction))]
+            for c in np.unique(labels)]
+    held = np.sort(np.concatenate(held)) if held else np.zeros(0, dtype=np.int64)
+    rest = np.ones(len(labels), dtype=bool)
+    rest[held] = False
+    return np.flatnonzero(rest), held
+
+
+_worker_corpus = None
+_worker_model = None
+
+def _init_worker(corpus, model):
+    global _worker_corpus, _worker_model
+    _worker_corpus = corpus
+    _worker_model = model
+
+def _fit_fold(docs):
+    """Cuenta los documentos de una partición con una copia vacía del modelo"""
+    fold = _worker_corpus.take(docs)
+    model = copy.deepcopy(_worker_model)
+    return model.partial_fit_encoded(fold.words, fold.offsets, fold.ids, fold.labels)
+
+def _evaluate_fold(task):
+    """
+    Resta del modelo total los conteos de una partición y puntúa con el resultado los
+    documentos de esa partición
+    """
+    fold_model, docs = task
+    model = copy.deepcopy(_worker_model).subtract(fold_model)
+    fold = _worker_corpus.take(docs)
+    y_pred = model.predict_encoded(fold.words, fold.offsets, fold.ids)
+    return confusion_matrix(fold.labels, y_pred, _worker_model.classes)
+
+
+def _map(fn, tasks, workers, corpus, model):
+    """
+    Aplica fn a las tareas en un grupo de procesos que comparten el corpus y el modelo
+    (o en este mismo proceso con workers=1)
+    """
+    if workers <= 1:
+        _init_worker(corpus, model)
+        try:
+            return list(map(fn, tasks))
+        finally:
+            _init_worker(None, None)
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(corpus, model)) as pool:
+        return pool.map(fn, tasks)
+
+
+def cross_validate(corpus, model, k=5, workers=1, seed=0):
+    """
+    Validación cruzada con k particiones. Cada partición se cuenta una sola vez (en
+    paralelo) y sus conteos se suman en un modelo total; el modelo de la iteración i se
+    obtiene restando del total los conteos de la partición i, sin volver a contar el
+    resto del corpus. Los resultados son idénticos a entrenar k modelos desde cero.
+
+    corpus: EncodedCorpus con los documentos y sus etiquetas
+    model: modelo sin entrenar que sirve de plantilla (NaiveBayes o HashingNaiveBayes)
+    k: número de particiones
+    workers: número de procesos para contar y evaluar las particiones
+    seed: semilla del reparto aleatorio de documentos
+
+    Retorna un diccionario con la exactitud y las métricas de cada partición, la matriz
+    de confusión acumulada con sus métricas, y la media y desviación de la exactitud
+    """
+    if k < 2:
+        raise ValueError("La validación cruzada requiere al menos 2 particiones")
+    if len(corpus) < k:
+        raise ValueError("Hay menos documentos que particiones")
+
+    start = time.time()
+    folds = assign_folds(len(corpus), k, seed)
+    workers = min(workers, k)
+
+    fold_models = _map(_fit_fold, folds, workers, corpus, model)
+    fit_seconds = time.time() - start
+
+    total = copy.deepcopy(fold_models[0])
+    for fold_model in fold_models[1:]:
+        total.merge(fold_model)
+    classes = total.classes
+    confusions = _map(_evaluate_fold, list(zip(fold_models, folds)), workers, corpus, total)
+
+    accuracies = np.array([accuracy_from_confusion(cm) for cm in confusions])
+    confusion = np.sum(confusions, axis=0)
+    return {
+        'classes': classes,
+        'folds': [{'documents': len(docs), 'accuracy': float(accuracy),
+                   'metrics': metrics_from_confusion(cm, classes)}
+                  for docs, accuracy, cm in zip(folds, accuracies, confusions)],
+        'confusion': confusion,
+        'metrics': metrics_from_confusion(confusion, classes),
+        'accuracy_mean': float(accuracies.mean()),
+        'accuracy_std': float(accuracies.std()),
+        'fit_seconds': fit_seconds,
+        'seconds': time.time() - start,
+    }
@@ -0,0 +1,80 @@
+import numpy as np
+
+# Criterios para ordenar las palabras cuando se conservan sólo las top_k
+CRITERIA = ('frequency', 'chi2', 'mi')
+
+
+def frequency_scores(feature_counts):
+    """
+    Número total de apariciones de cada palabra en el corpus de entrenamiento
+    """
+    return feature_counts.sum(axis=0).astype(np.float64)
+
+
+def chi2_scores(feature_counts):
+    """
+    Estadístico chi-cuadrado entre cada palabra y la clase, calculado a partir de la
+    matriz de conteos (n_clases, vocab_size): compara los conteos observados por clase
+    con los esperados si la palabra se repartiera según el tamaño de cada clase
+    """
+    counts = feature_counts.astype(np.float64)
+    class_totals = counts.sum(axis=1, keepdims=True)
+    word_totals = counts.sum(axis=0, keepdims=True)
+    expected = class_totals * word_totals / max(counts.sum(), 1.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(expected > 0, (counts - expected) ** 2 / expected, 0.0)
+    return terms.sum(axis=0)
+
+
+def mutual_information_scores(feature_counts):
+    """
+    Información mutua (en nats) entre la clase y el evento "la palabra es esta",
+    tomando cada aparición de palabra del corpus como una observación
+    """
+    counts = feature_counts.astype(np.float64)
+    total = max(counts.sum(), 1.0)
+    p_class = counts.sum(axis=1, keepdims=True) / total
+    p_word = counts.sum(axis=0, keepdims=True) / total
+
+    # Tabla de contingencia 2 x n_clases por palabra: la palabra aparece o no
+    p_joint = counts / total
+    p_rest = p_class - p_joint
+    mi = np.zeros(counts.shape[1])
+    for joint, marginal in ((p_joint, p_word), (p_rest, 1.0 - p_word)):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            terms = joint * np.log(joint / (p_class * marginal))
+        mi += np.where(joint > 0, terms, 0.0).sum(axis=0)
+    return mi
+
+
+def select_features(feature_counts, min_count=1, top_k=None, criterion='frequency'):
+    """
+    Selecciona las columnas (palabras) que se conservan en el modelo
+
+    feature_counts: matriz de conteos (n_clases, vocab_size)
+    min_count: apariciones mínimas de una palabra en todo el corpus
+    top_k: número máximo de palabras a conservar (None para no limitarlo)
+    criterion: 'frequency', 'chi2' o 'mi' (información mutua) para ordenar las palabras
+
+    Retorna una máscara booleana de longitud vocab_size
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(f"Criterio desconocido: {criterion} (opciones: {', '.join(CRITERIA)})")
+
+    mask = frequency_scores(feature_counts) >= min_count
+    if top_k is None or mask.sum() <= top_k:
+        return mask
+
+    if criterion == 'frequency':
+        scores = frequency_scores(feature_counts)
+    elif criterion == 'chi2':
+        scores = chi2_scores(feature_counts)
+    else:
+        scores = mutual_information_scores(feature_counts)
+
+    # Descartar las palabras ya excluidas y conservar las top_k de mayor puntuación
+    scores = np.where(mask, scores, -np.inf)
+    keep = np.argpartition(-scores, top_k - 1)[:top_k]
+    mask = np.zeros(len(mask), dtype=bool)
+    mask[keep] = True
+    return mask
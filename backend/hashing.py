@@ -0,0 +1,34 @@
+import hashlib
+import numpy as np
+
+
+def token_hash(word):
+    """
+    Hash estable de 64 bits de una palabra (hash() de Python cambia entre procesos)
+    """
+    return int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def hash_words(words):
+    """
+    Retorna un arreglo uint64 con el hash estable de cada palabra
+    """
+    return np.fromiter((token_hash(word) for word in words), dtype=np.uint64, count=len(words))
+
+
+def index_batch(X):
+    """
+    Asigna a cada palabra distinta de un lote de documentos una posición, para calcular
+    su hash (o buscarla) una sola vez por lote
+
+    X: lista de listas de palabras
+
+    Retorna (lengths, positions, words): el número de palabras de cada documento, la
+    posición de cada palabra (documento tras documento) y la lista de palabras distintas
+    """
+    lengths = np.fromiter((len(doc) for doc in X), dtype=np.int64, count=len(X))
+    unique_words = {}
+    positions = np.fromiter((unique_words.setdefault(word, len(unique_words))
+                             for doc in X for word in doc),
+                            dtype=np.int64, count=int(lengths.sum()))
+    return lengths, positions, list(unique_words)
@@ -1,16 +1,82 @@
+import os
 import pickle
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from model_format import CompiledModel, is_binary_model, stat_version
+
+class PredictionCache:
+    def __init__(self, max_size=10000):
+        """
+        Caché LRU acotada de predicciones, indexada por la secuencia de palabras
+        preprocesadas (textos que sólo difieren en menciones, enlaces, hashtags o
+        puntuación comparten entrada)
+        
+        max_size: número máximo de entradas; 0 desactiva la caché
+        """
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return value
+    
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
 
 class SentimentInference:
-    def __init__(self, model_path='models/model.pkl', preprocessor_path='models/preprocessor.pkl'):
+    def __init__(self, model_path='models/model.pkl', preprocessor_path='models/preprocessor.pkl',
+                 cache_size=10000, metrics=None):
         """
         Inicializa el motor de inferencia cargando el modelo y el preprocesador
         
-        model_path: ruta al archivo del modelo guardado
+        model_path: ruta al archivo del modelo guardado (pickle o formato binario de model_format)
         preprocessor_path: ruta al archivo del preprocesador guardado
+        cache_size: número máximo de predicciones en caché (0 la desactiva)
+        metrics: instancia de metrics.SentimentMetrics donde registrar la duración de
+            cada etapa y el tamaño de los textos (None para no instrumentar)
         """
-        # Cargar el modelo
-        with open(model_path, 'rb') as f:
-            self.model = pickle.load(f)
+        self.metrics = metrics
+        self.cache = PredictionCache(cache_size)
+        self.load_model(model_path)
             
         # Cargar el preprocesador
         with open(preprocessor_path, 'rb') as f:
@@ -36,48 +102,152 @@ class SentimentInference:
             ]
         }
     
-    def predict(self, text):
+    def load_model(self, model_path):
         """
-        Predice el sentimiento de un texto
+        Carga (o recarga) el modelo e invalida la caché de predicciones
         
-        text: texto a analizar
+        model_path: ruta al archivo del modelo guardado (pickle o formato binario de model_format)
+        """
+        # Cargar el modelo: el formato binario se mapea en memoria, el pickle se carga completo
+        start = time.perf_counter()
+        if is_binary_model(model_path):
+            model = CompiledModel(model_path)
+            version = model.version
+        else:
+            with open(model_path, 'rb') as f:
+                model = pickle.load(f)
+                # Versión del archivo que se leyó, aunque se reemplace después
+                version = stat_version(os.fstat(f.fileno()))
         
-        Retorna: Un diccionario con la etiqueta predicha y las probabilidades
+        self.model = model
+        self.model_path = model_path
+        self.load_seconds = time.perf_counter() - start
+        self.loaded_at = time.time()
+        self.model_version = version
+        self.cache.clear()
+    
+    def validate(self, min_accuracy=0.8):
+        """
+        Verifica que el modelo produzca probabilidades válidas y clasifique correctamente
+        al menos min_accuracy de los ejemplos de self.examples. Lanza ValueError si no.
         """
-        # Preprocesar el texto
-        tokens = self.preprocessor.preprocess(text)
+        texts = [text for label in self.examples for text in self.examples[label]]
+        expected = [label for label in self.examples for _ in self.examples[label]]
+        # La validación no debe contarse en las métricas ni dejar rastro en la caché
+        metrics, self.metrics = self.metrics, None
+        try:
+            results = self.analyze_batch(texts)
+        finally:
+            self.metrics = metrics
+            self.cache.clear()
+            self.cache.reset_stats()
         
-        # Realizar la predicción
-        probas = self.model.predict_proba([tokens])[0]
-        prediction = self.model.predict([tokens])[0]
+        errors = []
+        for text, label, result in zip(texts, expected, results):
+            probabilities = list(result['probabilities'].values())
+            if not all(np.isfinite(probabilities)) or abs(sum(probabilities) - 1) > 1e-6:
+                raise ValueError(f"El modelo produjo probabilidades inválidas para {text!r}")
+            if result['prediction'] != label:
+                errors.append(f"{text!r}: se esperaba {label}, se obtuvo {result['prediction']}")
         
-        # Formatear resultados
-        result = {
-            "prediction": self.label_map.get(prediction, "desconocido"),
-            "probabilities": {
-                "negativo": probas.get(0, 0.0),
-                "positivo": probas.get(1, 0.0)
-            },
-            "confidence": max(probas.values())
+        accuracy = 1 - len(errors) / len(texts)
+        if accuracy < min_accuracy:
+            raise ValueError(f"El modelo no pasó la validación ({accuracy:.0%} de aciertos en "
+                             f"los ejemplos): " + "; ".join(errors))
+    
+    def info(self):
+        """Datos del modelo cargado para /status"""
+        return {
+            'path': self.model_path,
+            'version': self.model_version,
+            'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.loaded_at)),
+            'load_seconds': self.load_seconds
         }
+    
+    def predict(self, text):
+        """
+        Predice el sentimiento de un texto
+        
+        text: texto a analizar
         
-        return result
+        Retorna: Un diccionario con la etiqueta predicha y las probabilidades
+        """
+        return self.analyze_batch([text])[0]
     
     def analyze_batch(self, texts):
         """
-        Analiza un lote de textos
+        Analiza un lote de textos: se preprocesan todos y se puntúan con una sola
+        llamada al modelo, calculando las probabilidades de cada documento una vez
         
         texts: lista de textos a analizar
         
         Retorna: Una lista de resultados
         """
-        results = []
+        # Preprocesar los textos
+        if self.metrics is None:
+            return self.predict_tokens(self.preprocessor.preprocess_batch(texts))
+
+        start = time.perf_counter()
+        tokens = self.preprocessor.preprocess_batch(texts)
+        self.metrics.stage_seconds.observe(time.perf_counter() - start, stage='preprocess')
+        self.metrics.texts.inc(len(texts))
+        self.metrics.text_length.observe_many([len(text) for text in texts])
+        self.metrics.tokens.observe_many([len(doc) for doc in tokens])
+        return self.predict_tokens(tokens)
+    
+    def predict_tokens(self, tokens):
+        """
+        Predice el sentimiento de documentos ya preprocesados. Los documentos que están
+        en la caché no se vuelven a puntuar; el resto se puntúa en una sola llamada.
         
-        for text in texts:
-            result = self.predict(text)
-            results.append(result)
-            
-        return results
+        tokens: lista de listas de palabras (salida de Preprocessor.preprocess)
+        
+        Retorna: Una lista de resultados
+        """
+        keys = [tuple(doc) for doc in tokens]
+        entries = [self.cache.get(key) for key in keys]
+        
+        # Puntuar una sola vez cada documento distinto que no está en la caché
+        missing = list(dict.fromkeys(key for key, entry in zip(keys, entries) if entry is None))
+        if missing:
+            start = time.perf_counter()
+            probas = self.model.predict_proba_matrix([list(key) for key in missing])
+            scored = dict(zip(missing, self._summarize(probas)))
+            if self.metrics is not None:
+                self.metrics.stage_seconds.observe(time.perf_counter() - start, stage='score')
+            for key, entry in scored.items():
+                self.cache.put(key, entry)
+            entries = [scored[key] if entry is None else entry for key, entry in zip(keys, entries)]
+        
+        # Formatear resultados
+        return [{
+            "prediction": prediction,
+            "probabilities": {
+                "negativo": negative,
+                "positivo": positive
+            },
+            "confidence": confidence
+        } for prediction, negative, positive, confidence in entries]
+    
+    def _summarize(self, probas):
+        """
+        Convierte la matriz de probabilidades (columnas en el orden de model.classes)
+        en tuplas (predicción, P(negativo), P(positivo), confianza)
+        """
+        classes = np.asarray(self.model.classes).tolist()
+        column = {c: k for k, c in enumerate(classes)}
+        neg = column.get(0)
+        pos = column.get(1)
+        
+        summaries = []
+        for row, best in zip(probas.tolist(), np.argmax(probas, axis=1).tolist()):
+            summaries.append((
+                self.label_map.get(classes[best], "desconocido"),
+                row[neg] if neg is not None else 0.0,
+                row[pos] if pos is not None else 0.0,
+                row[best]
+            ))
+        return summaries
 
 # Ejemplo de uso
 if __name__ == "__main__":
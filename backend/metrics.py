@@ -0,0 +1,195 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+
+# Límites de los histogramas (el último intervalo, +Inf, se añade al exportar)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5)
+TEXT_LENGTH_BUCKETS = (10, 20, 40, 60, 80, 100, 140, 200, 280, 500, 1000)
+TOKEN_BUCKETS = (0, 1, 2, 3, 5, 8, 12, 16, 20, 30, 50)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Contador monotónico, opcionalmente con etiquetas
+
+        name: nombre de la métrica (por convención termina en _total)
+        documentation: descripción que se exporta en la línea # HELP
+        labelnames: nombres de las etiquetas
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        """
+        Histograma con intervalos fijos: cada observación sólo incrementa un contador,
+        así que el costo no depende del número de observaciones acumuladas
+
+        name: nombre de la métrica
+        documentation: descripción que se exporta en la línea # HELP
+        buckets: límites superiores de los intervalos, en orden creciente
+        labelnames: nombres de las etiquetas
+        """
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._bounds = np.array(self.buckets, dtype=np.float64)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _get_series(self, key):
+        # Conteos por intervalo (sin acumular; el último es +Inf) y suma de observaciones
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        return series
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._get_series(key)
+            series[0][index] += 1
+            series[1] += value
+
+    def observe_many(self, values, **labels):
+        """
+        Registra varias observaciones tomando el candado una sola vez; los lotes grandes
+        se reparten en los intervalos con una operación vectorizada
+        """
+        key = tuple(labels[name] for name in self.labelnames)
+        if len(values) < 32:
+            # Para pocos valores (peticiones individuales) NumPy cuesta más que bisect
+            with self._lock:
+                series = self._get_series(key)
+                for value in values:
+                    series[0][bisect.bisect_left(self.buckets, value)] += 1
+                    series[1] += value
+            return
+
+        values = np.asarray(values, dtype=np.float64)
+        counts = np.bincount(np.searchsorted(self._bounds, values, side='left'),
+                             minlength=len(self.buckets) + 1).tolist()
+        total = float(values.sum())
+        with self._lock:
+            series = self._get_series(key)
+            series[0] = [a + b for a, b in zip(series[0], counts)]
+            series[1] += total
+
+    @contextmanager
+    def time(self, **labels):
+        """Mide la duración (segundos) del bloque with"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(float(bound))))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, documentation, fn):
+        """
+        Valor instantáneo que se calcula al exportar llamando a fn (por ejemplo, el
+        tamaño de la caché)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.fn = fn
+
+    def render(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge',
+                f'{self.name} {_format_value(self.fn())}']
+
+
+class SentimentMetrics:
+    def __init__(self):
+        """
+        Métricas del servicio de análisis: latencia por etapa (preprocesamiento,
+        puntuación y serialización JSON), latencia y número de peticiones por endpoint,
+        errores, y longitud y número de palabras de los textos analizados
+        """
+        self.stage_seconds = Histogram(
+            'sentiment_stage_seconds', 'Duración de cada etapa del análisis en segundos',
+            LATENCY_BUCKETS, ('stage',))
+        self.request_seconds = Histogram(
+            'sentiment_request_seconds', 'Duración de las peticiones HTTP en segundos',
+            LATENCY_BUCKETS, ('endpoint',))
+        self.requests = Counter(
+            'sentiment_requests_total', 'Peticiones HTTP atendidas', ('endpoint', 'status'))
+        self.errors = Counter(
+            'sentiment_errors_total', 'Peticiones que terminaron en error', ('endpoint',))
+        self.text_length = Histogram(
+            'sentiment_text_length_chars', 'Longitud en caracteres de los textos analizados',
+            TEXT_LENGTH_BUCKETS)
+        self.tokens = Histogram(
+            'sentiment_tokens', 'Número de palabras de cada texto tras el preprocesamiento',
+            TOKEN_BUCKETS)
+        self.texts = Counter('sentiment_texts_total', 'Textos analizados')
+        self.reloads = Counter(
+            'sentiment_model_reloads_total', 'Recargas del modelo por resultado', ('result',))
+        self._metrics = [self.stage_seconds, self.request_seconds, self.requests, self.errors,
+                         self.text_length, self.tokens, self.texts, self.reloads]
+
+    def add_gauge(self, name, documentation, fn):
+        self._metrics.append(Gauge(name, documentation, fn))
+
+    def render(self):
+        """Exporta todas las métricas en el formato de texto de Prometheus"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,247 @@
+import hashlib
+import json
+import os
+import numpy as np
+from naive_bayes import (sparse_counts, sparse_counts_ngrams, sparse_scores, normalize_scores,
+                         sparse_log_odds, log_odds_proba)
+from hashing import hash_words, index_batch
+
+# Formato binario del modelo:
+#   MAGIC (8 bytes) | longitud del encabezado (uint64) | encabezado JSON | secciones
+# Cada sección es un arreglo contiguo alineado a 64 bytes, descrito en el encabezado
+# con su desplazamiento, tipo y forma, de modo que puede abrirse con np.memmap.
+MAGIC = b'NBMODEL1'
+ALIGNMENT = 64
+
+
+def is_binary_model(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _align(position):
+    return (position + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def export_model(model, path):
+    """
+    Guarda un NaiveBayes entrenado en el formato binario: la tabla de hashes del
+    vocabulario (ordenada) y la matriz float32 de log-probabilidades, cuyas columnas
+    siguen el mismo orden que la tabla. La última columna corresponde a las palabras
+    desconocidas.
+
+    Los modelos HashingNaiveBayes se guardan sin tabla de vocabulario: las columnas de
+    la matriz son directamente las cubetas de hash.
+
+    Con n-gramas se añade la tabla ordenada de sus claves, expresadas con las posiciones
+    de las palabras en la tabla de hashes; sus columnas van antes de la de desconocidas.
+
+    Los modelos de dos clases guardan, en lugar de la matriz, un solo vector float32 de
+    pesos log P(w|1) - log P(w|0) (sección log_odds) y el sesgo en el encabezado.
+    """
+    if model.log_priors is None:
+        model._compile()
+
+    if hasattr(model, 'n_features'):
+        # Modelo con hashing: no hay vocabulario, las columnas ya son cubetas de hash
+        sections = _weight_sections(model, slice(None))
+        header = {
+            'version': 1,
+            'kind': 'hashing',
+            'classes': np.asarray(model.classes).tolist(),
+            'alpha': float(model.alpha),
+            'n_features': model.n_features,
+            'log_priors': model.log_priors.tolist(),
+            'bias': model.bias,
+            'sections': {},
+        }
+        _write(path, header, sections)
+        return
+
+    hashes = hash_words(list(model.vocabulary))
+    order = np.argsort(hashes, kind='stable')
+    hashes = hashes[order]
+    if np.any(hashes[1:] == hashes[:-1]):
+        raise ValueError("Colisión de hash en el vocabulario; no se puede exportar el modelo")
+
+    vocab_size = len(hashes)
+    sections = {'hashes': hashes}
+    columns = [order]
+    if len(model.ngram_keys):
+        # Traducir las claves de n-gramas a las posiciones de las palabras en la tabla
+        position = np.empty(vocab_size, dtype=np.int64)
+        position[order] = np.arange(vocab_size)
+        ngram_keys, _ = model._remap_ngram_keys(position)
+        ngram_order = np.argsort(ngram_keys)
+        sections['ngram_keys'] = ngram_keys[ngram_order]
+        columns.append(vocab_size + ngram_order)
+    # Columna de las palabras desconocidas, después de las palabras y los n-gramas
+    columns.append([vocab_size + len(model.ngram_keys)])
+    sections.update(_weight_sections(model, np.concatenate(columns)))
+
+    header = {
+        'version': 1,
+        'kind': 'vocabulary',
+        'classes': np.asarray(model.classes).tolist(),
+        'alpha': float(model.alpha),
+        'vocab_size': vocab_size,
+        'ngrams': model.ngrams,
+        'log_priors': model.log_priors.tolist(),
+        'bias': model.bias,
+        'sections': {},
+    }
+    _write(path, header, sections)
+
+
+def _weight_sections(model, columns):
+    """Pesos del modelo con las columnas en el orden indicado"""
+    if model.log_odds is not None:
+        return {'log_odds': np.ascontiguousarray(model.log_odds[columns], dtype=np.float32)}
+    return {'log_probs': np.ascontiguousarray(model.log_probs[:, columns], dtype=np.float32)}
+
+
+def _write(path, header, sections):
+    # Identificador del contenido: hash de los arreglos y del encabezado (sin los
+    # desplazamientos). Se calcula al exportar para que la carga no lea el archivo completo.
+    digest = hashlib.sha256(json.dumps(header, sort_keys=True).encode('utf-8'))
+    for name, array in sections.items():
+        digest.update(name.encode('utf-8'))
+        digest.update(np.ascontiguousarray(array).data)
+    header['content_hash'] = digest.hexdigest()[:12]
+
+    # El encabezado incluye los desplazamientos de las secciones, que dependen de su
+    # propio tamaño: se reserva espacio de sobra y se rellena con espacios
+    reserved = _align(len(json.dumps(header)) + 256 * len(sections) + 16)
+    position = len(MAGIC) + 8 + reserved
+    for name, array in sections.items():
+        position = _align(position)
+        header['sections'][name] = {'offset': position, 'dtype': array.dtype.str,
+                                    'shape': list(array.shape)}
+        position += array.nbytes
+
+    encoded = json.dumps(header).encode('utf-8').ljust(reserved)
+    # Escribir en un archivo temporal y reemplazar: los servidores que tienen mapeado el
+    # modelo anterior siguen leyéndolo intacto, y la recarga nunca ve un archivo a medias
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(encoded).to_bytes(8, 'little'))
+        f.write(encoded)
+        for name, array in sections.items():
+            f.seek(header['sections'][name]['offset'])
+            f.write(array.tobytes())
+    os.replace(temp_path, path)
+
+
+def stat_version(stat):
+    """
+    Identificador corto de un archivo a partir de su tamaño, fecha de modificación e
+    inodo (sin leer su contenido)
+    """
+    key = f'{stat.st_size}:{stat.st_mtime_ns}:{stat.st_ino}'.encode('utf-8')
+    return hashlib.sha256(key).hexdigest()[:12]
+
+
+class CompiledModel:
+    def __init__(self, path):
+        """
+        Carga un modelo en formato binario mapeando sus arreglos en memoria con np.memmap.
+        Los procesos que abren el mismo archivo comparten las páginas a través de la
+        caché del sistema operativo, y la carga no lee la matriz completa.
+
+        path: ruta al archivo exportado con export_model
+        """
+        # El encabezado y las secciones se leen del mismo archivo abierto: si el modelo
+        # se reemplaza mientras tanto, lo mapeado sigue correspondiendo al encabezado
+        arrays = {}
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} no es un modelo en formato binario")
+            length = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(length).decode('utf-8'))
+            stat = os.fstat(f.fileno())
+
+            for name, section in header['sections'].items():
+                dtype, shape = np.dtype(section['dtype']), tuple(section['shape'])
+                if 0 in shape:
+                    # np.memmap no admite arreglos vacíos
+                    arrays[name] = np.zeros(shape, dtype=dtype)
+                else:
+                    arrays[name] = np.memmap(f, dtype=dtype, mode='r',
+                                             offset=section['offset'], shape=shape)
+
+        self.path = path
+        self.header = header
+        # Los archivos exportados antes de incluir content_hash se identifican por su stat
+        self.version = header.get('content_hash') or stat_version(stat)
+        self.classes = np.array(header['classes'])
+        self.alpha = header['alpha']
+        self.log_priors = np.array(header['log_priors'], dtype=np.float64)
+        self.kind = header.get('kind', 'vocabulary')
+        # Dos clases: vector de log-razones y sesgo; en otro caso, matriz de log-probabilidades
+        self.log_odds = arrays.get('log_odds')
+        self.bias = header.get('bias')
+        self.log_probs = arrays.get('log_probs')
+        self.n_columns = len(self.log_odds) if self.log_odds is not None else self.log_probs.shape[1]
+        self.hashes = arrays.get('hashes')
+        self.n_features = header.get('n_features')
+        self.ngrams = header.get('ngrams', 1)
+        self.ngram_keys = arrays.get('ngram_keys', np.zeros(0, dtype=np.uint64))
+
+    def _lookup(self, words):
+        """
+        Retorna la columna de cada palabra (vocab_size si es desconocida)
+        """
+        if self.kind == 'hashing':
+            return (hash_words(words) % np.uint64(self.n_features)).astype(np.int64)
+
+        vocab_size = len(self.hashes)
+        if vocab_size == 0:
+            return np.full(len(words), vocab_size, dtype=np.int64)
+        hashes = hash_words(words)
+        columns = np.minimum(np.searchsorted(self.hashes, hashes), vocab_size - 1)
+        return np.where(self.hashes[columns] == hashes, columns, vocab_size)
+
+    def _vectorize(self, X):
+        # Calcular el hash de cada palabra distinta del lote una sola vez
+        lengths, positions, unique_words = index_batch(X)
+        columns = self._lookup(unique_words)
+        if self.ngrams > 1:
+            return sparse_counts_ngrams(lengths, columns[positions], len(self.hashes),
+                                        self.ngrams, self.ngram_keys)
+        return sparse_counts(lengths, columns[positions], self.n_columns)
+
+    def predict_proba_matrix(self, X):
+        """
+        Predice las probabilidades de cada clase como una matriz (n_documentos, n_clases),
+        con las columnas en el orden de self.classes
+
+        X: lista de listas, donde cada lista contiene las palabras de un documento
+        """
+        if self.log_odds is not None:
+            return log_odds_proba(sparse_log_odds(self._vectorize(X), self.log_odds, self.bias))
+        return normalize_scores(sparse_scores(self._vectorize(X), self.log_probs, self.log_priors))
+
+    def predict_proba(self, X):
+        """
+        Predice la probabilidad de cada clase para los documentos dados, como un
+        diccionario {clase: probabilidad} por documento. Se mantiene por compatibilidad;
+        para lotes grandes conviene predict_proba_matrix, que evita crear un dict por fila
+
+        X: lista de listas, donde cada lista contiene las palabras de un documento
+        """
+        probs = self.predict_proba_matrix(X)
+        classes = np.asarray(self.classes).tolist()
+        return [dict(zip(classes, row)) for row in probs.tolist()]
+
+    def predict(self, X):
+        """
+        Predice la clase para los documentos dados
+
+        X: lista de listas, donde cada lista contiene las palabras de un documento
+        """
+        if self.log_odds is not None:
+            log_odds = sparse_log_odds(self._vectorize(X), self.log_odds, self.bias)
+            return self.classes[(log_odds > 0).astype(np.int64)]
+        scores = sparse_scores(self._vectorize(X), self.log_probs, self.log_priors)
+        return self.classes[np.argmax(scores, axis=1)]
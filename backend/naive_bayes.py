@@ -1,116 +1,734 @@
 import numpy as np
 import math
-from collections import defaultdict, Counter
+from hashing import hash_words, index_batch
+import evaluation
+
+
+def sparse_counts(lengths, ids, n_columns):
+    """
+    Construye una matriz dispersa de conteos en formato CSR
+
+    lengths: número de palabras de cada documento
+    ids: columna de cada palabra, documento tras documento
+    n_columns: número de columnas de la matriz
+
+    Retorna (indptr, indices, counts): los términos del documento i ocupan
+    indices[indptr[i]:indptr[i + 1]]
+    """
+    n_docs = len(lengths)
+    doc_ids = np.repeat(np.arange(n_docs, dtype=np.int64), lengths)
+
+    # Agrupar palabras repetidas dentro de un mismo documento
+    keys, counts = np.unique(doc_ids * n_columns + ids, return_counts=True)
+    docs, indices = np.divmod(keys, n_columns)
+
+    indptr = np.zeros(n_docs + 1, dtype=np.int64)
+    np.cumsum(np.bincount(docs, minlength=n_docs), out=indptr[1:])
+    return indptr, indices, counts.astype(np.float64)
+
+
+def sparse_scores(csr, log_probs, log_priors):
+    """
+    Multiplica la matriz dispersa de conteos por la matriz de log-probabilidades
+    transpuesta y suma los log-priors. Retorna una matriz (n_documentos, n_clases).
+    """
+    indptr, indices, counts = csr
+    n_docs = len(indptr) - 1
+    row = np.repeat(np.arange(n_docs), np.diff(indptr))
+
+    scores = np.empty((n_docs, len(log_priors)), dtype=np.float64)
+    for k in range(len(log_priors)):
+        scores[:, k] = np.bincount(row, weights=log_probs[k, indices] * counts, minlength=n_docs)
+    scores += log_priors
+    return scores
+
+
+def normalize_scores(scores):
+    """
+    Convierte log-probabilidades conjuntas en probabilidades normalizadas por fila
+    """
+    # Restar el máximo por fila para estabilidad numérica
+    scores -= scores.max(axis=1, keepdims=True)
+    np.exp(scores, out=scores)
+    scores /= scores.sum(axis=1, keepdims=True)
+    return scores
+
+
+def sparse_log_odds(csr, log_odds, bias):
+    """
+    Para modelos de dos clases: suma por documento de los pesos log P(w|1) - log P(w|0)
+    de sus palabras, más el sesgo log P(1) - log P(0). Retorna un vector (n_documentos,).
+    """
+    indptr, indices, counts = csr
+    n_docs = len(indptr) - 1
+    row = np.repeat(np.arange(n_docs), np.diff(indptr))
+    return np.bincount(row, weights=log_odds[indices] * counts, minlength=n_docs) + bias
+
+
+def log_odds_proba(log_odds):
+    """
+    Convierte la log-razón de probabilidades en una matriz (n_documentos, 2) con la
+    función sigmoide, calculada con logaddexp para no desbordar con valores extremos
+    """
+    probs = np.empty((len(log_odds), 2), dtype=np.float64)
+    probs[:, 1] = np.exp(-np.logaddexp(0.0, -log_odds))
+    probs[:, 0] = np.exp(-np.logaddexp(0.0, log_odds))
+    return probs
+
+
+# Los n-gramas (n = 2..MAX_NGRAM) se codifican como un entero de 64 bits que empaqueta
+# los índices de sus palabras, NGRAM_BITS bits por palabra
+NGRAM_BITS = 21
+MAX_NGRAM = 3
+MAX_NGRAM_VOCABULARY = 2 ** NGRAM_BITS - 1
+
+
+def ngram_keys(lengths, ids, max_n, n_words):
+    """
+    Codifica los n-gramas (n = 2..max_n) de cada documento como claves uint64. Cada
+    palabra ocupa NGRAM_BITS bits con su índice + 1, así que un bigrama y un trigrama
+    nunca comparten clave. Se omiten los n-gramas con alguna palabra desconocida.
+
+    lengths: número de palabras de cada documento
+    ids: índice de cada palabra, documento tras documento
+    max_n: longitud máxima de los n-gramas
+    n_words: tamaño del vocabulario; los índices >= n_words son palabras desconocidas
+
+    Retorna (docs, keys): el documento de cada n-grama y su clave
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    doc_ids = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+    codes = ids.astype(np.uint64) + np.uint64(1)
+    known = ids < n_words
+
+    docs, keys = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.uint64)]
+    for n in range(2, max_n + 1):
+        m = len(ids) - n + 1
+        if m <= 0:
+            break
+        # El n-grama que empieza en i es válido si termina en el mismo documento
+        valid = known[:m] & (doc_ids[:m] == doc_ids[n - 1:])
+        key = codes[:m].copy()
+        for j in range(1, n):
+            valid &= known[j:j + m]
+            key |= codes[j:j + m] << np.uint64(NGRAM_BITS * j)
+        docs.append(doc_ids[:m][valid])
+        keys.append(key[valid])
+    return np.concatenate(docs), np.concatenate(keys)
+
+
+def unpack_ngram_keys(keys):
+    """
+    Retorna una matriz (n_claves, MAX_NGRAM) con los índices de palabra de cada clave
+    (-1 en las posiciones vacías de los bigramas)
+    """
+    mask = np.uint64(2 ** NGRAM_BITS - 1)
+    parts = [((keys >> np.uint64(NGRAM_BITS * j)) & mask).astype(np.int64) - 1
+             for j in range(MAX_NGRAM)]
+    return np.stack(parts, axis=1) if len(keys) else np.zeros((0, MAX_NGRAM), dtype=np.int64)
+
+
+def pack_ngram_keys(parts):
+    """Inversa de unpack_ngram_keys"""
+    keys = np.zeros(len(parts), dtype=np.uint64)
+    for j in range(parts.shape[1]):
+        keys |= (parts[:, j] + 1).astype(np.uint64) << np.uint64(NGRAM_BITS * j)
+    return keys
+
+
+def find_sorted(table, keys):
+    """
+    Posición de cada clave en el arreglo ordenado table, o -1 si no está
+    """
+    if len(table) == 0:
+        return np.full(len(keys), -1, dtype=np.int64)
+    positions = np.minimum(np.searchsorted(table, keys), len(table) - 1)
+    return np.where(table[positions] == keys, positions, -1)
+
+
+def sparse_counts_ngrams(lengths, ids, n_words, max_n, table):
+    """
+    Igual que sparse_counts, añadiendo los n-gramas conocidos de cada documento. Las
+    columnas son: palabras (0..n_words - 1), n-gramas en el orden de table y, al final,
+    las palabras desconocidas. Los n-gramas que no están en table se ignoran.
+
+    ids: índice de cada palabra (n_words o más para las desconocidas)
+    table: claves ordenadas de los n-gramas del modelo
+    """
+    n_columns = n_words + len(table) + 1
+    ids = np.asarray(ids, dtype=np.int64)
+    docs, keys = ngram_keys(lengths, ids, max_n, n_words)
+    positions = find_sorted(table, keys)
+    found = positions >= 0
+
+    n_docs = len(lengths)
+    all_docs = np.concatenate([np.repeat(np.arange(n_docs, dtype=np.int64), lengths), docs[found]])
+    all_ids = np.concatenate([np.where(ids < n_words, ids, n_columns - 1),
+                              n_words + positions[found]])
+    order = np.argsort(all_docs, kind='stable')
+    return sparse_counts(np.bincount(all_docs, minlength=n_docs), all_ids[order], n_columns)
+
 
 class NaiveBayes:
-    def __init__(self):
-        # Probabilidades previas de las clases P(y)
-        self.class_priors = {}
-        
-        # Probabilidades condicionales P(xi|y)
-        self.feature_probs = {}
-        
-        # Vocabulario
-        self.vocabulary = set()
+    def __init__(self, ngrams=1, alpha=1.0):
+        """
+        ngrams: longitud máxima de los n-gramas usados como características (1 a 3).
+            Con 1 el modelo sólo usa palabras sueltas.
+        alpha: parámetro de suavizado de Laplace. Se aplica al puntuar a partir de los
+            conteos, así que se puede cambiar (o buscar con tune_alpha) sin reentrenar.
+        """
+        if not 1 <= ngrams <= MAX_NGRAM:
+            raise ValueError(f"ngrams debe estar entre 1 y {MAX_NGRAM}")
+        self.ngrams = ngrams
+
+        # Vocabulario: palabra -> índice de columna (en orden de aparición)
+        self.vocabulary = {}
         
-        # Número de clases
-        self.classes = []
+        # Clases conocidas
+        self.classes = np.array([])
         
-        # Conteo de palabras para cada clase
-        self.word_counts = {}
+        # Número de documentos de cada clase
+        self.class_counts = np.zeros(0, dtype=np.int64)
         
-        # Conteo total de palabras para cada clase
-        self.total_word_counts = {}
+        # Conteo de palabras para cada clase: matriz (n_clases, vocab_size)
+        self.feature_counts = np.zeros((0, 0), dtype=np.int64)
+
+        # N-gramas (n >= 2): claves empaquetadas ordenadas y su conteo por clase
+        self.ngram_keys = np.zeros(0, dtype=np.uint64)
+        self.ngram_counts = np.zeros((0, 0), dtype=np.int64)
         
         # Parámetro para suavizado Laplace
-        self.alpha = 1.0
+        self._alpha = None
+        self.alpha = alpha
+
+        # Exactitud de cada alpha probado en la última llamada a tune_alpha
+        self.alpha_scores = None
+
+        # Selección de características aplicada al modelo (por ejemplo, la de
+        # train_model.py) o None. Un modelo podado ya no equivale a sus conteos
+        # completos: partial_fit volvería a sumar las palabras descartadas sólo con los
+        # conteos de los documentos nuevos.
+        self.feature_selection = None
+
+        # Modo compilado: matrices densas de log-probabilidades derivadas de los conteos.
+        # La última columna de log_probs corresponde a las palabras desconocidas.
+        self.log_probs = None
+        self.log_priors = None
+
+        # Con dos clases se puntúa con un solo vector de pesos log P(w|1) - log P(w|0)
+        # y un sesgo, que reemplazan a log_probs (queda en None)
+        self.log_odds = None
+        self.bias = None
+
+    def __getstate__(self):
+        """
+        Estado para pickle: sólo los conteos. Las log-probabilidades se derivan de
+        ellos al puntuar por primera vez después de cargar el modelo.
+        """
+        state = self.__dict__.copy()
+        state.update(log_probs=None, log_priors=None, log_odds=None, bias=None)
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restaura un modelo serializado con pickle. Los modelos guardados con versiones
+        anteriores (diccionarios de conteos y probabilidades) se convierten a matrices.
+        """
+        if isinstance(state.get('vocabulary'), set):
+            state = self._convert_legacy_state(state)
+        # Modelos guardados antes de incorporar los n-gramas
+        state.setdefault('ngrams', 1)
+        state.setdefault('ngram_keys', np.zeros(0, dtype=np.uint64))
+        state.setdefault('ngram_counts', np.zeros((len(state['classes']), 0), dtype=np.int64))
+        # Los modelos guardados antes de __getstate__ incluyen las matrices compiladas:
+        # se descartan y se vuelven a derivar de los conteos
+        state.update(log_probs=None, log_priors=None, log_odds=None, bias=None)
+        # Modelos guardados cuando alpha era un atributo simple
+        if 'alpha' in state:
+            state['_alpha'] = state.pop('alpha')
+        state.setdefault('alpha_scores', None)
+        state.setdefault('feature_selection', None)
+        self.__dict__.update(state)
+
+    @property
+    def alpha(self):
+        """Parámetro de suavizado de Laplace"""
+        return self._alpha
+
+    @alpha.setter
+    def alpha(self, value):
+        value = float(value)
+        if not value > 0:
+            raise ValueError("alpha debe ser positivo")
+        if value != self._alpha:
+            self._alpha = value
+            # Las log-probabilidades se vuelven a derivar de los conteos al puntuar
+            self.log_probs = None
+            self.log_priors = None
+
+    @staticmethod
+    def _convert_legacy_state(state):
+        classes = np.asarray(state['classes'])
+        vocabulary = {word: i for i, word in enumerate(sorted(state['vocabulary']))}
+
+        feature_counts = np.zeros((len(classes), len(vocabulary)), dtype=np.int64)
+        for k, c in enumerate(classes):
+            for word, count in state['word_counts'][c].items():
+                if word in vocabulary:
+                    feature_counts[k, vocabulary[word]] = count
+
+        return {
+            'vocabulary': vocabulary,
+            'classes': classes,
+            # Sólo se conservan las proporciones de las clases, no el número de documentos
+            'class_counts': np.array([state['class_priors'][c] for c in classes], dtype=np.float64),
+            'feature_counts': feature_counts,
+            'alpha': state['alpha'],
+            'log_probs': None,
+            'log_priors': None,
+        }
+
+    @property
+    def class_priors(self):
+        """Probabilidades previas de las clases P(y)"""
+        priors = self.class_counts / self.class_counts.sum()
+        return dict(zip(self.classes, priors.tolist()))
+
+    @property
+    def total_word_counts(self):
+        """Conteo total de palabras para cada clase"""
+        return dict(zip(self.classes, self.feature_counts.sum(axis=1).tolist()))
+
+    @property
+    def word_counts(self):
+        """
+        Conteo de palabras para cada clase como diccionarios. Se construye bajo demanda
+        a partir de feature_counts (costoso con vocabularios grandes).
+        """
+        words = list(self.vocabulary)
+        return {c: {words[i]: int(row[i]) for i in np.flatnonzero(row)}
+                for c, row in zip(self.classes, self.feature_counts)}
+
+    @property
+    def feature_probs(self):
+        """
+        Probabilidades condicionales P(xi|y) como diccionarios. Se construyen bajo demanda
+        a partir de los conteos (costoso con vocabularios grandes).
+        """
+        words = list(self.vocabulary)
+        probs = np.exp(self._log_probs()[:, :len(words)])
+        return {c: dict(zip(words, row.tolist())) for c, row in zip(self.classes, probs)}
 
     def fit(self, X, y):
         """
-        Entrena el modelo Naive Bayes
+        Entrena el modelo Naive Bayes desde cero
         
         X: lista de listas, donde cada lista contiene las palabras de un documento
         y: lista de etiquetas de clase
         """
-        # Obtener clases únicas
-        self.classes = np.unique(y)
-        n_samples = len(y)
-        
-        # Crear vocabulario
-        for doc in X:
-            self.vocabulary.update(doc)
-        
-        vocab_size = len(self.vocabulary)
-        
-        # Calcular probabilidades previas P(y)
-        for c in self.classes:
-            self.class_priors[c] = np.sum(y == c) / n_samples
-            
-        # Inicializar contadores
-        self.word_counts = {c: defaultdict(int) for c in self.classes}
-        self.total_word_counts = {c: 0 for c in self.classes}
-        
-        # Contar ocurrencias de palabras en cada clase
-        for doc, label in zip(X, y):
-            for word in doc:
-                self.word_counts[label][word] += 1
-                self.total_word_counts[label] += 1
-                
-        # Calcular probabilidades condicionales con suavizado Laplace
-        self.feature_probs = {c: {} for c in self.classes}
-        
-        for c in self.classes:
-            for word in self.vocabulary:
-                # P(word|class) = (count(word, class) + alpha) / (total_words_in_class + alpha * vocab_size)
-                numerator = self.word_counts[c][word] + self.alpha
-                denominator = self.total_word_counts[c] + self.alpha * vocab_size
-                self.feature_probs[c][word] = numerator / denominator
-                
-    def predict_proba(self, X):
+        self._reset()
+        return self.partial_fit(X, y)
+
+    def _reset(self):
+        self.vocabulary = {}
+        self.classes = np.array([])
+        self.class_counts = np.zeros(0, dtype=np.int64)
+        self.feature_counts = np.zeros((0, 0), dtype=np.int64)
+        self.ngram_keys = np.zeros(0, dtype=np.uint64)
+        self.ngram_counts = np.zeros((0, 0), dtype=np.int64)
+
+    def partial_fit(self, X, y):
         """
-        Predice la probabilidad de cada clase para los documentos dados
+        Actualiza el modelo con nuevos documentos sin reentrenar desde cero: suma los
+        conteos de clases y palabras y amplía el vocabulario. El resultado es idéntico
+        a llamar fit con todos los documentos vistos hasta ahora.
         
         X: lista de listas, donde cada lista contiene las palabras de un documento
+        y: lista de etiquetas de clase
         """
-        result = []
-        
-        for doc in X:
-            class_scores = {}
-            
-            for c in self.classes:
-                # Inicializar con el logaritmo de la probabilidad previa P(y)
-                score = math.log(self.class_priors[c])
-                
-                # Sumar los logaritmos de las probabilidades condicionales P(xi|y)
-                for word in doc:
-                    if word in self.vocabulary:
-                        score += math.log(self.feature_probs[c][word])
-                    else:
-                        # Palabra nueva, usar suavizado Laplace
-                        score += math.log(self.alpha / (self.total_word_counts[c] + self.alpha * len(self.vocabulary)))
-                
-                class_scores[c] = score
-                
-            # Convertir a probabilidades (normalizar)
-            result.append(self._normalize_log_probs(class_scores))
-            
-        return result
-    
-    def _normalize_log_probs(self, log_probs):
+        self._check_counts()
+        self._check_ngram_vocabulary(word for doc in X for word in doc)
+        
+        # Asignar un índice entero a cada palabra nueva en una sola pasada
+        intern = self.vocabulary.setdefault
+        lengths = np.fromiter((len(doc) for doc in X), dtype=np.int64, count=len(X))
+        ids = np.fromiter((intern(word, len(self.vocabulary)) for doc in X for word in doc),
+                          dtype=np.int64, count=int(lengths.sum()))
+        self._add_counts(y, lengths, ids)
+        return self
+
+    def partial_fit_encoded(self, words, offsets, ids, y):
         """
-        Normaliza los logaritmos de probabilidades a probabilidades
+        Igual que partial_fit, pero con documentos ya codificados como índices enteros
+        (por ejemplo, producidos por procesos en paralelo o leídos de disco). Las palabras
+        nuevas se incorporan en el mismo orden en que partial_fit las encontraría.
+        
+        words: lista de palabras; ids hace referencia a posiciones de esta lista
+        offsets: las palabras del documento i son ids[offsets[i]:offsets[i + 1]]
+        ids: arreglo de índices de palabra
+        y: lista de etiquetas de clase
         """
-        # Encontrar el valor máximo para estabilidad numérica
-        max_log_prob = max(log_probs.values())
+        self._check_counts()
+        ids = np.asarray(ids, dtype=np.int64)
+        
+        # Ordenar las palabras usadas por su primera aparición
+        used, first = np.unique(ids, return_index=True)
+        self._check_ngram_vocabulary(str(words[i]) for i in used)
+        used = used[np.argsort(first)]
+        
+        intern = self.vocabulary.setdefault
+        mapping = np.zeros(len(words), dtype=np.int64)
+        mapping[used] = np.fromiter((intern(str(words[i]), len(self.vocabulary)) for i in used),
+                                    dtype=np.int64, count=len(used))
+        self._add_counts(y, np.diff(offsets), mapping[ids])
+        return self
+
+    def _add_counts(self, y, lengths, ids):
+        """Suma los conteos de documentos ya traducidos a columnas de feature_counts"""
+        y = np.asarray(y)
+        self._add_classes(np.unique(y))
+        y_index = np.searchsorted(self.classes, y).astype(np.int64)
+        n_classes = len(self.classes)
+        self._grow_vocabulary(len(self.vocabulary))
+        n_columns = self.feature_counts.shape[1]
+        
+        # Contar ocurrencias de palabras en cada clase: fila = clase, columna = palabra
+        token_class = np.repeat(y_index, lengths)
+        self.feature_counts += np.bincount(token_class * n_columns + ids,
+                                           minlength=n_classes * n_columns
+                                           ).reshape(n_classes, n_columns)
+        self.class_counts += np.bincount(y_index, minlength=n_classes)
+        if self.ngrams > 1:
+            self._add_ngram_counts(y_index, lengths, ids)
         
-        # Restar el máximo (para evitar desbordamiento)
-        exp_probs = {c: math.exp(log_prob - max_log_prob) for c, log_prob in log_probs.items()}
+        # Las probabilidades se derivan de los conteos al puntuar por primera vez
+        self.log_probs = None
+        self.log_priors = None
+
+    def _add_ngram_counts(self, y_index, lengths, ids):
+        """Suma los conteos de los n-gramas de documentos ya traducidos a índices"""
+        docs, keys = ngram_keys(lengths, ids, self.ngrams, len(self.vocabulary))
+        batch_keys, inverse = np.unique(keys, return_inverse=True)
+        self._grow_ngrams(batch_keys)
         
-        # Normalizar
-        total = sum(exp_probs.values())
-        normalized = {c: p / total for c, p in exp_probs.items()}
+        n_classes, n_ngrams = self.ngram_counts.shape
+        columns = np.searchsorted(self.ngram_keys, batch_keys)[inverse.reshape(-1)]
+        self.ngram_counts += np.bincount(y_index[docs] * n_ngrams + columns,
+                                         minlength=n_classes * n_ngrams
+                                         ).reshape(n_classes, n_ngrams)
+
+    def _check_ngram_vocabulary(self, words):
+        """
+        Con n-gramas, verifica antes de modificar el modelo que el vocabulario ampliado
+        con las palabras dadas quepa en los NGRAM_BITS bits de cada palabra de las
+        claves; si no, las claves de los n-gramas se mezclarían entre sí
+        """
+        if self.ngrams <= 1:
+            return
+        vocabulary = self.vocabulary
+        new_words = {word for word in words if word not in vocabulary}
+        if len(vocabulary) + len(new_words) > MAX_NGRAM_VOCABULARY:
+            raise ValueError(f"Con n-gramas el vocabulario admite como máximo "
+                             f"{MAX_NGRAM_VOCABULARY} palabras")
+
+    def _grow_ngrams(self, keys):
+        """Incorpora a la tabla ordenada de n-gramas las claves nuevas (columnas vacías)"""
+        merged = np.union1d(self.ngram_keys, keys)
+        if len(merged) == len(self.ngram_keys):
+            return
+        ngram_counts = np.zeros((len(self.classes), len(merged)), dtype=np.int64)
+        ngram_counts[:, np.searchsorted(merged, self.ngram_keys)] = self.ngram_counts
+        self.ngram_keys = merged
+        self.ngram_counts = ngram_counts
+
+    def _remap_ngram_keys(self, mapping):
+        """
+        Traduce los índices de palabra de las claves de n-gramas con mapping (índice
+        anterior -> nuevo, -1 si la palabra se eliminó). Retorna (claves, válidas).
+        """
+        parts = unpack_ngram_keys(self.ngram_keys)
+        present = parts >= 0
+        mapped = np.where(present, mapping[np.maximum(parts, 0)], -1)
+        valid = ~np.any(present & (mapped < 0), axis=1)
+        return pack_ngram_keys(mapped), valid
+
+    def merge(self, other):
+        """
+        Suma a este modelo los conteos de otro modelo entrenado por separado (por ejemplo,
+        con otra partición de los datos). El resultado es idéntico a entrenar con la unión
+        de ambos conjuntos de documentos.
+        
+        other: instancia de NaiveBayes con el mismo valor de ngrams
+        """
+        return self._combine(other, 1)
+
+    def subtract(self, other):
+        """
+        Resta de este modelo los conteos de otro entrenado con una parte de sus documentos
+        (la operación inversa de merge). Las palabras y n-gramas que se quedan sin
+        apariciones se eliminan, así que el resultado es idéntico a entrenar sin esos
+        documentos. La validación cruzada lo usa para no volver a contar el corpus.
+        
+        other: instancia compatible con merge cuyos documentos forman parte de este modelo
+        """
+        self._combine(other, -1)
+        if (np.any(self.class_counts < 0) or np.any(self.feature_counts < 0)
+                or np.any(self.ngram_counts < 0)):
+            raise ValueError("Los documentos del otro modelo no forman parte de este")
+        return self._drop_empty_columns()
+
+    def _drop_empty_columns(self):
+        """Elimina las palabras y n-gramas sin apariciones en ninguna clase"""
+        if len(self.ngram_keys):
+            seen = self.ngram_counts.any(axis=0)
+            self.ngram_keys = self.ngram_keys[seen]
+            self.ngram_counts = self.ngram_counts[:, seen]
+        return self.prune(self.feature_counts.any(axis=0))
+
+    def _combine(self, other, sign):
+        """Suma (sign=1) o resta (sign=-1) los conteos de otro modelo"""
+        if other.ngrams != self.ngrams:
+            raise ValueError("Sólo se pueden combinar modelos con la misma longitud de n-gramas")
+        self._check_counts()
+        other._check_counts()
+        self._check_ngram_vocabulary(other.vocabulary)
+        self._add_classes(other.classes)
+        rows = np.searchsorted(self.classes, other.classes)
         
-        return normalized
+        # Traducir los índices de palabra del otro modelo a los de este
+        intern = self.vocabulary.setdefault
+        columns = np.fromiter((intern(word, len(self.vocabulary)) for word in other.vocabulary),
+                              dtype=np.int64, count=len(other.vocabulary))
+        self._grow_vocabulary(len(self.vocabulary))
+        
+        self.feature_counts[np.ix_(rows, columns)] += sign * other.feature_counts
+        self.class_counts[rows] += sign * other.class_counts
+        
+        if len(other.ngram_keys):
+            keys, _ = other._remap_ngram_keys(columns)
+            self._grow_ngrams(keys)
+            ngram_columns = np.searchsorted(self.ngram_keys, keys)
+            self.ngram_counts[np.ix_(rows, ngram_columns)] += sign * other.ngram_counts
+        
+        self.log_probs = None
+        self.log_priors = None
+        return self
+
+    def prune(self, mask):
+        """
+        Elimina del modelo las palabras no seleccionadas (ver feature_selection). Las
+        palabras eliminadas pasan a tratarse como desconocidas al predecir, y los
+        n-gramas que las contienen se eliminan.
+
+        mask: arreglo booleano de longitud vocab_size, True para las palabras que se conservan
+        """
+        mask = np.asarray(mask, dtype=bool)
+        if len(mask) != self.feature_counts.shape[1]:
+            raise ValueError("La máscara debe tener una entrada por palabra del vocabulario")
+
+        words = [word for word, keep in zip(self.vocabulary, mask) if keep]
+        self.vocabulary = {word: i for i, word in enumerate(words)}
+        self.feature_counts = self.feature_counts[:, mask]
+        
+        if len(self.ngram_keys):
+            mapping = np.where(mask, np.cumsum(mask) - 1, -1)
+            keys, valid = self._remap_ngram_keys(mapping)
+            # Conservar el orden de las claves ya traducidas
+            order = np.argsort(keys[valid], kind='stable')
+            self.ngram_keys = keys[valid][order]
+            self.ngram_counts = self.ngram_counts[:, valid][:, order]
+
+        self.log_probs = None
+        self.log_priors = None
+        return self
+
+    def _check_counts(self):
+        if not np.issubdtype(self.class_counts.dtype, np.integer):
+            raise ValueError("El modelo fue guardado con una versión anterior que no conserva "
+                             "el número de documentos por clase; vuelve a entrenarlo con fit")
+
+    def _add_classes(self, labels):
+        """Incorpora clases nuevas manteniendo self.classes ordenado"""
+        classes = np.union1d(self.classes, labels) if len(self.classes) else np.unique(labels)
+        if len(classes) == len(self.classes):
+            return
+        rows = np.searchsorted(classes, self.classes)
+        
+        class_counts = np.zeros(len(classes), dtype=np.int64)
+        class_counts[rows] = self.class_counts
+        feature_counts = np.zeros((len(classes), self.feature_counts.shape[1]), dtype=np.int64)
+        feature_counts[rows] = self.feature_counts
+        ngram_counts = np.zeros((len(classes), len(self.ngram_keys)), dtype=np.int64)
+        ngram_counts[rows] = self.ngram_counts
+        
+        self.classes = classes
+        self.class_counts = class_counts
+        self.feature_counts = feature_counts
+        self.ngram_counts = ngram_counts
+
+    def _grow_vocabulary(self, vocab_size):
+        """Añade columnas vacías a feature_counts para las palabras nuevas"""
+        missing = vocab_size - self.feature_counts.shape[1]
+        if missing > 0:
+            self.feature_counts = np.pad(self.feature_counts, ((0, 0), (0, missing)))
+
+    def _compile(self):
+        """
+        Deriva de los conteos la representación compilada del modelo: una matriz
+        (n_clases, vocab_size + 1) con log P(palabra|clase) y el vector log P(y).
+        Con n-gramas, sus columnas van entre las palabras y la de las desconocidas.
+        Con dos clases sólo se conserva el vector log_odds, de la mitad de tamaño.
+        """
+        log_probs = self._log_probs()
+        log_priors = np.log(self.class_counts / self.class_counts.sum())
+        
+        if len(self.classes) == 2:
+            self.log_probs = None
+            self.log_odds = log_probs[1] - log_probs[0]
+            self.bias = float(log_priors[1] - log_priors[0])
+        else:
+            self.log_probs = log_probs
+            self.log_odds = None
+            self.bias = None
+        # log_priors indica que el modelo está compilado: se asigna al final para que
+        # otro hilo que puntúa a la vez no vea los pesos a medio asignar
+        self.log_priors = log_priors
+
+    def _log_probs(self):
+        """
+        Matriz (n_clases, columnas + 1) de log P(columna|clase). Se toma la compilada si
+        existe; si no (por ejemplo, con dos clases), se calcula a partir de los conteos.
+        """
+        if self.log_probs is not None and self.log_priors is not None:
+            return self.log_probs
+        counts = self._count_matrix()
+        vocab_size = counts.shape[1]
+        
+        # P(word|class) = (count(word, class) + alpha) / (total_words_in_class + alpha * vocab_size)
+        log_denominator = np.log(counts.sum(axis=1) + self.alpha * vocab_size)
+        
+        log_probs = np.empty((len(self.classes), vocab_size + 1), dtype=np.float64)
+        np.log(counts + self.alpha, out=log_probs[:, :vocab_size])
+        # Columna extra: probabilidad suavizada de una palabra nueva
+        log_probs[:, vocab_size] = math.log(self.alpha)
+        log_probs -= log_denominator[:, None]
+        return log_probs
+
+    def _count_matrix(self):
+        """Conteos por clase de todas las columnas: palabras seguidas de los n-gramas"""
+        if self.ngrams > 1:
+            return np.hstack([self.feature_counts, self.ngram_counts])
+        return self.feature_counts
+
+    def tune_alpha(self, X_val, y_val, alphas):
+        """
+        Elige el alpha con mayor exactitud en un conjunto de validación sin reentrenar.
+        Los documentos se vectorizan una sola vez y se reducen a las columnas que
+        aparecen en ellos; para cada alpha sólo se recalculan las log-probabilidades
+        de esas columnas y una suma dispersa por clase.
+
+        X_val: lista de listas, donde cada lista contiene las palabras de un documento
+        y_val: lista de etiquetas de clase
+        alphas: valores de alpha a probar (positivos)
+
+        Retorna el propio modelo con el mejor alpha; la exactitud de cada valor queda
+        en self.alpha_scores
+        """
+        alphas = [float(alpha) for alpha in alphas]
+        if not alphas or min(alphas) <= 0:
+            raise ValueError("Se esperaba al menos un valor de alpha, todos positivos")
+        if self.log_priors is None:
+            self._compile()
+
+        counts = self._count_matrix()
+        vocab_size = counts.shape[1]
+        totals = counts.sum(axis=1)
+        # La columna de palabras desconocidas tiene conteo cero en todas las clases
+        counts = np.hstack([counts, np.zeros((len(self.classes), 1), dtype=counts.dtype)])
+
+        indptr, indices, doc_counts = self._vectorize(X_val)
+        columns, compact = np.unique(indices, return_inverse=True)
+        csr = (indptr, compact.reshape(-1), doc_counts)
+        used_counts = counts[:, columns]
+
+        scores = {}
+        for alpha in alphas:
+            log_probs = np.log(used_counts + alpha)
+            log_probs -= np.log(totals + alpha * vocab_size)[:, None]
+            joint = sparse_scores(csr, log_probs, self.log_priors)
+            y_pred = np.asarray(self.classes)[np.argmax(joint, axis=1)]
+            cm = evaluation.confusion_matrix(y_val, y_pred, self.classes)
+            scores[alpha] = evaluation.accuracy_from_confusion(cm)
+
+        # En caso de empate se queda el primer valor de la lista
+        self.alpha = max(scores, key=scores.get)
+        self.alpha_scores = scores
+        return self
+
+    def _vectorize(self, X):
+        """
+        Convierte los documentos en una matriz dispersa de conteos en formato CSR.
+        Las palabras fuera del vocabulario se agrupan en la última columna.
+        """
+        unknown = len(self.vocabulary)
+        lookup = self.vocabulary.get
+
+        lengths = np.fromiter((len(doc) for doc in X), dtype=np.int64, count=len(X))
+        ids = np.fromiter((lookup(word, unknown) for doc in X for word in doc),
+                          dtype=np.int64, count=int(lengths.sum()))
+        return self._vectorize_ids(lengths, ids)
+
+    def _vectorize_encoded(self, words, offsets, ids):
+        """
+        Igual que _vectorize, con documentos codificados como índices de words: cada
+        palabra distinta se busca en el vocabulario una sola vez
+        """
+        unknown = len(self.vocabulary)
+        lookup = self.vocabulary.get
+        mapping = np.fromiter((lookup(str(word), unknown) for word in words),
+                              dtype=np.int64, count=len(words))
+        return self._vectorize_ids(np.diff(offsets), mapping[np.asarray(ids, dtype=np.int64)])
+
+    def _vectorize_ids(self, lengths, ids):
+        unknown = len(self.vocabulary)
+        if self.ngrams > 1:
+            return sparse_counts_ngrams(lengths, ids, unknown, self.ngrams, self.ngram_keys)
+        return sparse_counts(lengths, ids, unknown + 1)
+
+    def _joint_log_likelihood(self, X):
+        """
+        Calcula log P(y) + sum log P(xi|y) para cada documento y clase
+
+        Retorna una matriz (n_documentos, n_clases)
+        """
+        if self.log_priors is None:
+            self._compile()
+        return sparse_scores(self._vectorize(X), self._log_probs(), self.log_priors)
+
+    def predict_proba_matrix(self, X):
+        """
+        Predice las probabilidades de cada clase como una matriz (n_documentos, n_clases),
+        con las columnas en el orden de self.classes
+
+        X: lista de listas, donde cada lista contiene las palabras de un documento
+        """
+        if self.log_priors is None:
+            self._compile()
+        if self.log_odds is not None:
+            return log_odds_proba(sparse_log_odds(self._vectorize(X), self.log_odds, self.bias))
+        return normalize_scores(self._joint_log_likelihood(X))
+
+    def predict_proba(self, X):
+        """
+        Predice la probabilidad de cada clase para los documentos dados, como un
+        diccionario {clase: probabilidad} por documento. Se mantiene por compatibilidad;
+        para lotes grandes conviene predict_proba_matrix, que evita crear un dict por fila
+        
+        X: lista de listas, donde cada lista contiene las palabras de un documento
+        """
+        probs = self.predict_proba_matrix(X)
+        classes = np.asarray(self.classes).tolist()
+        return [dict(zip(classes, row)) for row in probs.tolist()]
     
     def predict(self, X):
         """
@@ -118,14 +736,29 @@ class NaiveBayes:
         
         X: lista de listas, donde cada lista contiene las palabras de un documento
         """
-        all_probs = self.predict_proba(X)
-        predictions = []
+        return self._predict_counts(self._vectorize(X))
+    
+    def predict_encoded(self, words, offsets, ids):
+        """
+        Igual que predict, con documentos ya codificados como índices enteros (por
+        ejemplo, un EncodedCorpus), sin convertirlos de vuelta en listas de palabras
         
-        for probs in all_probs:
-            # Seleccionar la clase con mayor probabilidad
-            predictions.append(max(probs, key=probs.get))
-            
-        return predictions
+        words: lista de palabras; ids hace referencia a posiciones de esta lista
+        offsets: las palabras del documento i son ids[offsets[i]:offsets[i + 1]]
+        ids: arreglo de índices de palabra
+        """
+        return self._predict_counts(self._vectorize_encoded(words, offsets, ids))
+    
+    def _predict_counts(self, csr):
+        # Seleccionar la clase con mayor probabilidad
+        if self.log_priors is None:
+            self._compile()
+        if self.log_odds is not None:
+            # Con dos clases gana la clase 1 si la log-razón es positiva (empate: clase 0)
+            log_odds = sparse_log_odds(csr, self.log_odds, self.bias)
+            return np.asarray(self.classes)[(log_odds > 0).astype(np.int64)]
+        scores = sparse_scores(csr, self.log_probs, self.log_priors)
+        return np.asarray(self.classes)[np.argmax(scores, axis=1)]
     
     def score(self, X, y):
         """
@@ -134,8 +767,7 @@ class NaiveBayes:
         X: lista de listas, donde cada lista contiene las palabras de un documento
         y: lista de etiquetas de clase
         """
-        y_pred = self.predict(X)
-        return np.mean(y_pred == y)
+        return evaluation.accuracy_from_confusion(self.confusion_matrix(X, y))
     
     def get_metrics(self, X, y):
         """
@@ -144,43 +776,101 @@ class NaiveBayes:
         X: lista de listas, donde cada lista contiene las palabras de un documento
         y: lista de etiquetas de clase
         """
-        y_pred = self.predict(X)
-        
-        # Inicializar métricas por clase
-        metrics = {}
-        
-        for c in self.classes:
-            # Verdaderos positivos, falsos positivos, falsos negativos
-            tp = np.sum((y == c) & (y_pred == c))
-            fp = np.sum((y != c) & (y_pred == c))
-            fn = np.sum((y == c) & (y_pred != c))
-            
-            # Calcular precision, recall, f1-score
-            precision = tp / (tp + fp) if (tp + fp) > 0 else 0
-            recall = tp / (tp + fn) if (tp + fn) > 0 else 0
-            f1 = 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0
-            
-            metrics[c] = {
-                'precision': precision,
-                'recall': recall,
-                'f1-score': f1
-            }
-            
-        # Calcular métricas promedio
-        avg_precision = np.mean([m['precision'] for m in metrics.values()])
-        avg_recall = np.mean([m['recall'] for m in metrics.values()])
-        avg_f1 = np.mean([m['f1-score'] for m in metrics.values()])
-        
-        metrics['avg'] = {
-            'precision': avg_precision,
-            'recall': avg_recall,
-            'f1-score': avg_f1
-        }
+        cm = self.confusion_matrix(X, y)
+        return self.metrics_from_confusion(cm), cm
+    
+    def confusion_matrix(self, X, y):
+        """
+        Calcula la matriz de confusión (filas: clase real, columnas: clase predicha)
+        
+        X: lista de listas, donde cada lista contiene las palabras de un documento
+        y: lista de etiquetas de clase
+        """
+        return evaluation.confusion_matrix(y, self.predict(X), self.classes)
+    
+    def metrics_from_confusion(self, cm):
+        """
+        Calcula precision, recall y f1-score por clase y promedio a partir de una
+        matriz de confusión (permite acumularla por lotes)
+        """
+        return evaluation.metrics_from_confusion(cm, self.classes)
+
+
+class HashingNaiveBayes(NaiveBayes):
+    def __init__(self, n_features=2 ** 20, alpha=1.0):
+        """
+        Naive Bayes con el truco de hashing: cada palabra se asigna a una de n_features
+        columnas según su hash, así que no se guarda vocabulario y la memoria del modelo
+        es fija aunque aparezcan palabras nuevas (errores, alargamientos, jerga). Las
+        palabras que comparten columna comparten conteos.
+        
+        n_features: número de columnas (por ejemplo 2 ** 20)
+        alpha: parámetro de suavizado de Laplace
+        """
+        super().__init__(alpha=alpha)
+        self.n_features = n_features
+        self.feature_counts = np.zeros((0, n_features), dtype=np.int64)
+
+    def _reset(self):
+        super()._reset()
+        self.feature_counts = np.zeros((0, self.n_features), dtype=np.int64)
+
+    def _columns(self, words):
+        """Columna de cada palabra: su hash estable módulo n_features"""
+        return (hash_words(words) % np.uint64(self.n_features)).astype(np.int64)
+
+    def partial_fit(self, X, y):
+        """
+        Actualiza el modelo con nuevos documentos sin reentrenar desde cero
         
-        # Calcular matriz de confusión
-        cm = np.zeros((len(self.classes), len(self.classes)), dtype=int)
-        for i, true_class in enumerate(self.classes):
-            for j, pred_class in enumerate(self.classes):
-                cm[i, j] = np.sum((y == true_class) & (y_pred == pred_class))
-                
-        return metrics, cm
\ No newline at end of file
+        X: lista de listas, donde cada lista contiene las palabras de un documento
+        y: lista de etiquetas de clase
+        """
+        self._check_counts()
+        lengths, positions, words = index_batch(X)
+        self._add_counts(y, lengths, self._columns(words)[positions])
+        return self
+
+    def partial_fit_encoded(self, words, offsets, ids, y):
+        """
+        Igual que partial_fit, pero con documentos ya codificados como índices de words
+        """
+        self._check_counts()
+        columns = self._columns([str(word) for word in words])
+        self._add_counts(y, np.diff(offsets), columns[np.asarray(ids, dtype=np.int64)])
+        return self
+
+    def _combine(self, other, sign):
+        # Sólo se pueden sumar o restar conteos de modelos con las mismas columnas
+        if getattr(other, 'n_features', None) != self.n_features:
+            raise ValueError("Sólo se pueden combinar modelos con el mismo número de columnas")
+        self._check_counts()
+        other._check_counts()
+        self._add_classes(other.classes)
+        rows = np.searchsorted(self.classes, other.classes)
+        
+        self.feature_counts[rows] += sign * other.feature_counts
+        self.class_counts[rows] += sign * other.class_counts
+        
+        self.log_probs = None
+        self.log_priors = None
+        return self
+
+    def _drop_empty_columns(self):
+        # El número de columnas es fijo: una cubeta vacía equivale a no haber visto sus palabras
+        return self
+
+    def prune(self, mask):
+        # Las columnas son cubetas de hash compartidas por varias palabras: no se pueden quitar
+        raise ValueError("HashingNaiveBayes no admite selección de características; "
+                         "reduce n_features en su lugar")
+
+    def _vectorize(self, X):
+        # Calcular el hash de cada palabra distinta del lote una sola vez
+        lengths, positions, words = index_batch(X)
+        return sparse_counts(lengths, self._columns(words)[positions], self.n_features + 1)
+
+    def _vectorize_encoded(self, words, offsets, ids):
+        columns = self._columns([str(word) for word in words])
+        return sparse_counts(np.diff(offsets), columns[np.asarray(ids, dtype=np.int64)],
+                             self.n_features + 1)
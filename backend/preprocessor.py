@@ -2,6 +2,20 @@ import re
 import string
 from collections import Counter
 
+# Patrones precompilados, en el mismo orden en que clean_text los aplica
+MENTION_PATTERN = re.compile(r'@\w+')
+URL_PATTERN = re.compile(r'http\S+|www\S+|https\S+')
+HASHTAG_PATTERN = re.compile(r'#\w+')
+RT_PATTERN = re.compile(r'\brt\b')
+DIGITS_PATTERN = re.compile(r'\d+')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+
+# Elimina en una sola pasada la puntuación y los dígitos ASCII (los únicos que \d
+# encuentra en un texto ASCII)
+PUNCTUATION_DIGITS_TABLE = str.maketrans('', '', string.punctuation + string.digits)
+
 class Preprocessor:
     def __init__(self):
         # Lista de stopwords en inglés (con algunas negaciones importantes conservadas)
@@ -36,13 +50,13 @@ class Preprocessor:
         Limpia el texto de caracteres especiales, enlaces, etc.
         """
         text = text.lower()
-        text = re.sub(r'@\w+', '', text)
-        text = re.sub(r'http\S+|www\S+|https\S+', '', text)
-        text = re.sub(r'#\w+', '', text)
-        text = re.sub(r'\brt\b', '', text)
-        text = re.sub(r'\d+', '', text)
-        text = text.translate(str.maketrans('', '', string.punctuation))
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = MENTION_PATTERN.sub('', text)
+        text = URL_PATTERN.sub('', text)
+        text = HASHTAG_PATTERN.sub('', text)
+        text = RT_PATTERN.sub('', text)
+        text = DIGITS_PATTERN.sub('', text)
+        text = text.translate(PUNCTUATION_TABLE)
+        text = WHITESPACE_PATTERN.sub(' ', text).strip()
         return text
 
     def tokenize(self, text):
@@ -52,10 +66,45 @@ class Preprocessor:
         return [token for token in tokens if token not in self.stopwords]
 
     def preprocess(self, text):
-        cleaned_text = self.clean_text(text)
-        tokens = self.tokenize(cleaned_text)
-        filtered_tokens = self.remove_stopwords(tokens)
-        return filtered_tokens
+        """
+        Limpia, tokeniza y elimina stopwords. Produce exactamente las mismas palabras que
+        remove_stopwords(tokenize(clean_text(text))), pero con menos pasadas sobre el texto:
+        - los patrones cuyo carácter o subcadena inicial no aparece se omiten
+        - los dígitos se eliminan junto con la puntuación en la tabla de traducción
+        - la tokenización y el filtrado de stopwords se hacen juntos (split() ya ignora
+          los espacios repetidos)
+        Los patrones se aplican en el mismo orden que clean_text, porque cada eliminación
+        puede crear coincidencias de la siguiente (por ejemplo "www@usuario" o "#http://...").
+        """
+        text = text.lower()
+        if '@' in text:
+            text = MENTION_PATTERN.sub('', text)
+        if 'http' in text or 'www' in text:
+            text = URL_PATTERN.sub('', text)
+        if '#' in text:
+            text = HASHTAG_PATTERN.sub('', text)
+        if 'rt' in text:
+            text = RT_PATTERN.sub('', text)
+        if not text.isascii():
+            text = DIGITS_PATTERN.sub('', text)
+        stopwords = self.stopwords
+        return [token for token in text.translate(PUNCTUATION_DIGITS_TABLE).split()
+                if token not in stopwords]
+
+    def preprocess_batch(self, texts):
+        """
+        Preprocesa una lista de textos. Retorna una lista de listas de palabras.
+        """
+        preprocess = self.preprocess
+        return [preprocess(text) for text in texts]
+
+    def check_equivalence(self, texts):
+        """
+        Compara preprocess con la secuencia de referencia clean_text -> tokenize ->
+        remove_stopwords. Retorna la lista de textos cuyo resultado difiere.
+        """
+        return [text for text in texts
+                if self.preprocess(text) != self.remove_stopwords(self.tokenize(self.clean_text(text)))]
     
     def build_vocabulary(self, preprocessed_data):
         all_words = []
@@ -67,4 +116,18 @@ class Preprocessor:
         return vocabulary
 
 
+# Verificación de equivalencia sobre el dataset
+if __name__ == "__main__":
+    import csv
+    import sys
+
+    dataset_path = sys.argv[1] if len(sys.argv) > 1 else '../dataset/training.1600000.processed.noemoticon.csv'
+    preprocessor = Preprocessor()
+
+    with open(dataset_path, 'r', encoding='latin-1') as file:
+        texts = [row[5] for row in csv.reader(file) if len(row) > 5]
 
+    mismatches = preprocessor.check_equivalence(texts)
+    print(f"Textos verificados: {len(texts)} | Diferencias: {len(mismatches)}")
+    for text in mismatches[:10]:
+        print(f"  {text!r}")
@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+
+
+class ModelReloader:
+    def __init__(self, load_fn, swap_fn, watch_paths=(), interval=0.0, on_result=None):
+        """
+        Recarga el modelo en segundo plano sin interrumpir las peticiones: load_fn
+        construye y valida un motor nuevo en un hilo aparte mientras el anterior sigue
+        atendiendo, y swap_fn lo publica con una sola asignación. Cada petición usa el
+        motor anterior o el nuevo completo, nunca una mezcla. Si la carga o la
+        validación fallan, el motor anterior sigue activo.
+
+        load_fn: función sin argumentos que retorna el motor nuevo (o lanza una excepción)
+        swap_fn: función que recibe el motor nuevo y lo publica
+        watch_paths: archivos a vigilar; si cambian se recarga automáticamente (los que
+            no existen cuentan como cambio cuando aparecen)
+        interval: segundos entre revisiones de watch_paths (0 desactiva la vigilancia)
+        on_result: función opcional que recibe el resultado de cada recarga
+
+        La vigilancia no empieza aquí sino con ensure_watching(), en el proceso que
+        atiende las peticiones (ver ensure_watching).
+        """
+        self.load_fn = load_fn
+        self.swap_fn = swap_fn
+        self.watch_paths = list(watch_paths)
+        self.interval = interval
+        self.on_result = on_result
+        self.reloads = 0
+        self.last_result = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._watch_pid = None
+        self._start_lock = threading.Lock()
+        # Archivos que corresponden al motor cargado: un proceso que empieza a vigilar
+        # más tarde recarga si cambiaron desde entonces
+        self._loaded_signature = self._signature()
+
+    def watching(self):
+        """Si este proceso tiene su propio hilo de vigilancia"""
+        return self._watch_pid == os.getpid()
+
+    def ensure_watching(self):
+        """
+        Inicia el hilo de vigilancia en el primer uso de cada proceso. Los servidores
+        que crean procesos con fork después de importar la aplicación (werkzeug con
+        processes=N, gunicorn --preload) no heredan los hilos, así que cada proceso
+        necesita el suyo para recargar su propio motor.
+        """
+        if self.interval <= 0 or not self.watch_paths or self._watch_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._watch_pid == os.getpid():
+                return
+            if self._watch_pid is not None:
+                # Proceso hijo: la recarga en curso del padre no existe aquí
+                self._lock = threading.Lock()
+                self._thread = None
+            thread = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+            thread.start()
+            self._watch_pid = os.getpid()
+
+    def reload(self):
+        """
+        Inicia una recarga en segundo plano. Retorna False si ya hay una en curso.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._thread = threading.Thread(target=self._run, name='model-reload', daemon=True)
+            self._thread.start()
+            return True
+
+    def wait(self, timeout=None):
+        """Espera a que termine la recarga en curso (si la hay)"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def in_progress(self):
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            engine = self.load_fn()
+            self.swap_fn(engine)
+        except Exception as e:
+            print(f"Error al recargar el modelo: {e}")
+            result = {'success': False, 'error': str(e)}
+        else:
+            self.reloads += 1
+            result = {'success': True}
+        result['seconds'] = time.perf_counter() - start
+        result['finished_at'] = time.time()
+        self.last_result = result
+        if self.on_result is not None:
+            self.on_result(result)
+
+    def _signature(self):
+        signature = []
+        for path in self.watch_paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                signature.append(None)
+            else:
+                signature.append((st.st_mtime_ns, st.st_size))
+        return tuple(signature)
+
+    def _watch(self):
+        last = self._loaded_signature
+        pending = None
+        while True:
+            time.sleep(self.interval)
+            signature = self._signature()
+            if signature == last:
+                pending = None
+                continue
+            # Esperar a que los archivos dejen de cambiar (entrenamiento aún escribiendo)
+            if signature != pending:
+                pending = signature
+                continue
+            if self.reload():
+                last = self._loaded_signature = signature
+                pending = None
+
+    def status(self):
+        return {
+            'in_progress': self.in_progress(),
+            'reloads': self.reloads,
+            'last_result': self.last_result,
+            'watching': self.watching(),
+            'pid': os.getpid(),
+        }
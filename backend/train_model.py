@@ -1,53 +1,96 @@
 import os
 import csv
 import pickle
+import argparse
+import copy
+import multiprocessing
 import numpy as np
 from preprocessor import Preprocessor
-from naive_bayes import NaiveBayes
+from naive_bayes import NaiveBayes, HashingNaiveBayes
+from corpus import EncodedCorpus
+from corpus_cache import cache_key, save_corpus, load_corpus
+from model_format import export_model, CompiledModel
+from feature_selection import CRITERIA, select_features
+from evaluation import cross_validate, stratified_holdout
 import time
 import gc
+import tempfile
 from collections import defaultdict
 
-def load_sentiment140_dataset(file_path):
-    X = []
-    y = []
-    print(f"Cargando dataset desde {file_path}...")
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
+BATCH_SIZE = 10000
+
+# Configuraciones de selección de características comparadas con --compare-selection:
+# (min_count, top_k, criterion)
+SELECTION_CONFIGS = [
+    (1, None, 'frequency'),
+    (2, None, 'frequency'),
+    (5, None, 'frequency'),
+    (1, 50000, 'frequency'),
+    (1, 50000, 'chi2'),
+    (1, 50000, 'mi'),
+    (1, 10000, 'chi2'),
+    (1, 10000, 'mi'),
+]
+
+# Valores de alpha probados con --search-alpha
+ALPHA_GRID = (0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+
+def iter_sentiment140(file_path):
+    """
+    Recorre el CSV de Sentiment140 fila por fila, generando (texto, etiqueta) con
+    etiqueta 0 (negativo) o 1 (positivo). Las demás filas se descartan.
+    """
     with open(file_path, 'r', encoding='latin-1') as file:
-        csv_reader = csv.reader(file)
         count = 0
-        pos_count = 0
-        neg_count = 0
-
-        for row in csv_reader:
+        for row in csv.reader(file):
             try:
                 sentiment = int(row[0].strip('"'))
                 text = row[5]
-
-                if sentiment == 0:
-                    label = 0
-                    neg_count += 1
-                elif sentiment == 4:
-                    label = 1
-                    pos_count += 1
-                    if pos_count == 1:
-                        print(f"\n¡Primer tweet positivo encontrado! -> {text[:100]}...")
-                else:
-                    continue
-
-                X.append(text)
-                y.append(label)
-                count += 1
-
-                if count % 100000 == 0:
-                    print(f"Procesados {count} tweets ({pos_count} positivos, {neg_count} negativos)")
-                if count == 800000:
-                    print(f"\n=== Alcanzados 800,000 registros ===\nNegativos: {neg_count}, Positivos: {pos_count}\n")
-
             except Exception as e:
                 print(f"Error en fila {count}: {e}")
                 continue
 
+            if sentiment == 0:
+                label = 0
+            elif sentiment == 4:
+                label = 1
+            else:
+                continue
+
+            count += 1
+            yield text, label
+
+def load_sentiment140_dataset(file_path):
+    X = []
+    y = []
+    print(f"Cargando dataset desde {file_path}...")
+
+    count = 0
+    pos_count = 0
+    neg_count = 0
+
+    for text, label in iter_sentiment140(file_path):
+        if label == 0:
+            neg_count += 1
+        else:
+            pos_count += 1
+            if pos_count == 1:
+                print(f"\n¡Primer tweet positivo encontrado! -> {text[:100]}...")
+
+        X.append(text)
+        y.append(label)
+        count += 1
+
+        if count % 100000 == 0:
+            print(f"Procesados {count} tweets ({pos_count} positivos, {neg_count} negativos)")
+        if count == 800000:
+            print(f"\n=== Alcanzados 800,000 registros ===\nNegativos: {neg_count}, Positivos: {pos_count}\n")
+
     print(f"\nTotal cargado: {len(X)}\nPositivos: {pos_count}, Negativos: {neg_count}")
     return X, np.array(y)
 
@@ -72,19 +115,454 @@ def preprocess_texts(X_raw, y_raw, preprocessor):
             y_filtered.append(label)
         if (i + 1) % 50000 == 0:
             print(f"Preprocesados {i+1}/{len(X_raw)} textos ({(i+1)/len(X_raw)*100:.1f}%)")
-            gc.collect()
     return X_preprocessed, np.array(y_filtered)
 
-def main():
-    dataset_path = '../dataset/training.1600000.processed.noemoticon.csv'
-    os.makedirs('models', exist_ok=True)
-    start_time_total = time.time()
+def iter_balanced(rows, min_count):
+    """
+    Deja pasar como máximo min_count filas de cada clase, en el orden del archivo
+    """
+    taken = defaultdict(int)
+    for text, label in rows:
+        if taken[label] < min_count:
+            taken[label] += 1
+            yield text, label
+
+def iter_preprocessed(rows, preprocessor):
+    """
+    Preprocesa cada fila y descarta las que quedan sin palabras
+    """
+    for text, label in rows:
+        tokens = preprocessor.preprocess(text)
+        if tokens:
+            yield tokens, label
+
+def iter_batches(docs, size=BATCH_SIZE):
+    """
+    Agrupa los documentos (tokens, etiqueta) en lotes (X, y)
+    """
+    X, y = [], []
+    for tokens, label in docs:
+        X.append(tokens)
+        y.append(label)
+        if len(X) == size:
+            yield X, np.array(y)
+            X, y = [], []
+    if X:
+        yield X, np.array(y)
+
+def iter_saved_batches(file):
+    file.seek(0)
+    while True:
+        try:
+            yield pickle.load(file)
+        except EOFError:
+            return
+
+def train_streaming(dataset_path, preprocessor, model):
+    """
+    Entrena sin cargar el corpus en memoria: las filas fluyen del CSV al filtro de
+    etiquetas, el balanceo, el preprocesamiento y el conteo por lotes.
+
+    El balanceo usa un conteo previo de filas por clase. Como el número de documentos
+    útiles no se conoce de antemano, uno de cada cinco documentos útiles se reserva para
+    prueba (en lugar de tomar el último 20%); esos lotes se escriben en un archivo
+    temporal para evaluarlos sin volver a preprocesarlos.
+    """
+    print(f"Contando tweets por clase en {dataset_path}...")
+    class_counts = defaultdict(int)
+    for _, label in iter_sentiment140(dataset_path):
+        class_counts[label] += 1
+    min_count = min(class_counts[0], class_counts[1])
+    print(f"Negativos: {class_counts[0]}, Positivos: {class_counts[1]}")
+    print(f"\nDataset balanceado: {min_count} negativos y {min_count} positivos")
+
+    rows = iter_balanced(iter_sentiment140(dataset_path), min_count)
+    docs = iter_preprocessed(rows, preprocessor)
+
+    print("\nPreprocesando y entrenando por lotes...")
+    start_train = time.time()
+    test_file = tempfile.TemporaryFile()
+    n_train = n_test = 0
+    for X_batch, y_batch in iter_batches(docs):
+        # Posición de cada documento útil dentro del lote: uno de cada cinco va a prueba
+        is_test = np.arange(n_train + n_test, n_train + n_test + len(X_batch)) % 5 == 4
+        model.partial_fit([x for x, t in zip(X_batch, is_test) if not t], y_batch[~is_test])
+        pickle.dump(([x for x, t in zip(X_batch, is_test) if t], y_batch[is_test]), test_file)
+        n_train += int(np.sum(~is_test))
+        n_test += int(np.sum(is_test))
+        print(f"Procesados {n_train + n_test} ejemplos útiles")
+
+    print(f"Entrenamiento: {n_train} | Prueba: {n_test}")
+    print(f"Entrenamiento completado en {time.time() - start_train:.2f} segundos")
+    return model, iter_saved_batches(test_file)
+
+def evaluate_batches(model, batches):
+    """
+    Acumula la matriz de confusión lote a lote y calcula las métricas a partir de ella
+    """
+    confusion = np.zeros((len(model.classes), len(model.classes)), dtype=int)
+    for X_batch, y_batch in batches:
+        confusion += model.confusion_matrix(X_batch, y_batch)
+    return model.metrics_from_confusion(confusion), confusion
+
+def split_into_fragments(file_path, n_fragments):
+    """
+    Divide el archivo en rangos de bytes de tamaño similar. Cada fila pertenece al
+    fragmento en el que comienza.
+    """
+    size = os.path.getsize(file_path)
+    bounds = [size * i // n_fragments for i in range(n_fragments + 1)]
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+def _read_lines(file, end):
+    while file.tell() < end:
+        line = file.readline()
+        if not line:
+            break
+        yield line.decode('latin-1')
+
+_worker_preprocessor = None
+
+def _init_worker(preprocessor):
+    global _worker_preprocessor
+    _worker_preprocessor = preprocessor
+
+def _process_fragment(task):
+    """
+    Lee y preprocesa las filas de un fragmento del CSV (en un proceso hijo).
+    Retorna el fragmento codificado con su propio vocabulario y el número de filas con error.
+    """
+    file_path, start, end = task
+    index = {}
+    intern = index.setdefault
+    ids, lengths, labels = [], [], []
+    errors = 0
+
+    with open(file_path, 'rb') as file:
+        if start > 0:
+            # Saltar la fila que comenzó en el fragmento anterior
+            file.seek(start - 1)
+            file.readline()
+
+        for row in csv.reader(_read_lines(file, end)):
+            try:
+                sentiment = int(row[0].strip('"'))
+                text = row[5]
+            except Exception:
+                errors += 1
+                continue
+            if sentiment == 0:
+                label = 0
+            elif sentiment == 4:
+                label = 1
+            else:
+                continue
+
+            tokens = _worker_preprocessor.preprocess(text)
+            ids.extend(intern(word, len(index)) for word in tokens)
+            lengths.append(len(tokens))
+            labels.append(label)
+
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return EncodedCorpus(list(index), offsets, ids, np.array(labels, dtype=np.int64)), errors
+
+def load_parallel(file_path, preprocessor, workers):
+    """
+    Carga y preprocesa el dataset repartiendo rangos de bytes del CSV entre varios procesos.
+    Retorna el corpus codificado completo, en el mismo orden que el archivo.
+    """
+    print(f"Cargando y preprocesando {file_path} con {workers} procesos...")
+    fragments = split_into_fragments(file_path, workers * 4)
+    tasks = [(file_path, start, end) for start, end in fragments]
+
+    parts = []
+    total_errors = 0
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(preprocessor,)) as pool:
+        for i, (part, errors) in enumerate(pool.imap(_process_fragment, tasks)):
+            parts.append(part)
+            total_errors += errors
+            print(f"Fragmento {i + 1}/{len(tasks)} listo ({len(part)} tweets)")
+
+    if total_errors:
+        print(f"Filas con error: {total_errors}")
+    corpus = EncodedCorpus.concatenate(parts)
+    print(f"\nTotal cargado: {len(corpus)}\nPositivos: {np.sum(corpus.labels == 1)}, "
+          f"Negativos: {np.sum(corpus.labels == 0)}")
+    return corpus
+
+def split_corpus(corpus):
+    """
+    Aplica al corpus codificado el mismo balanceo, filtro de documentos vacíos y
+    división 80/20 que balance_dataset y preprocess_texts
+    """
+    docs = useful_docs(corpus)
+    split = int(len(docs) * 0.8)
+    return corpus.take(docs[:split]), corpus.take(docs[split:])
+
+def useful_docs(corpus):
+    """
+    Índices de los documentos del corpus tras el balanceo de clases y el filtro de
+    documentos vacíos
+    """
+    negatives = np.flatnonzero(corpus.labels == 0)
+    positives = np.flatnonzero(corpus.labels == 1)
+    min_count = min(len(negatives), len(positives))
+    print(f"\nDataset balanceado: {min_count} negativos y {min_count} positivos")
+
+    docs = np.concatenate([negatives[:min_count], positives[:min_count]])
+    docs = docs[corpus.lengths[docs] > 0]
+    print(f"Total después del filtro: {len(docs)} ejemplos útiles")
+    return docs
+
+def report_cross_validation(dataset_path, preprocessor, model, args):
+    """
+    Reporta la exactitud media y por partición de una validación cruzada con
+    args.cross_validation particiones sobre el corpus balanceado
+    """
+    corpus = get_corpus(dataset_path, preprocessor, args)
+    corpus = corpus.take(useful_docs(corpus))
+
+    k = args.cross_validation
+    print(f"\nValidación cruzada con {k} particiones ({args.workers} procesos)...")
+    results = cross_validate(corpus, model, k=k, workers=args.workers)
+
+    for i, fold in enumerate(results['folds']):
+        print(f"  Partición {i + 1}: {fold['documents']} documentos, "
+              f"exactitud {fold['accuracy']:.4f}, f1 promedio {fold['metrics']['avg']['f1-score']:.4f}")
+    print(f"\nExactitud: {results['accuracy_mean']:.4f} ± {results['accuracy_std']:.4f}")
+    print(f"F1 promedio (matriz acumulada): {results['metrics']['avg']['f1-score']:.4f}")
+    print("\nMatriz de confusión acumulada:")
+    print(results['confusion'])
+    print(f"\nConteo de particiones: {results['fit_seconds']:.2f} s | "
+          f"Total: {results['seconds']:.2f} s")
+
+def get_corpus(file_path, preprocessor, args):
+    """
+    Retorna el corpus codificado del dataset. Salvo con --no-cache, se guarda en
+    args.cache_dir con una clave derivada del contenido del dataset y de la
+    configuración del preprocesador; las ejecuciones siguientes lo mapean en memoria
+    y pasan directamente al conteo.
+    """
+    if args.no_cache:
+        return load_parallel(file_path, preprocessor, args.workers)
+
+    start = time.time()
+    directory = os.path.join(args.cache_dir, cache_key(file_path, preprocessor))
+    corpus = load_corpus(directory)
+    if corpus is not None:
+        print(f"Corpus preprocesado leído de la caché {directory} "
+              f"({len(corpus)} tweets, {time.time() - start:.2f} segundos)")
+        return corpus
+
+    corpus = load_parallel(file_path, preprocessor, args.workers)
+    save_corpus(corpus, directory)
+    print(f"Corpus preprocesado guardado en la caché {directory}")
+    return corpus
+
+def train_with_corpus(corpus, model, args):
+    train, test = split_corpus(corpus)
+    del corpus
+    print(f"Entrenamiento: {len(train)} | Prueba: {len(test)}")
+
+    if args.compare_training:
+        compare_training(train.token_lists(), train.labels)
+
+    if args.search_alpha:
+        return search_alpha(train, model), test.token_lists(), test.labels
+
+    print("\nEntrenando modelo Naive Bayes...")
+    start_train = time.time()
+    model.partial_fit_encoded(train.words, train.offsets, train.ids, train.labels)
+    print(f"Entrenamiento completado en {time.time() - start_train:.2f} segundos")
+    return model, test.token_lists(), test.labels
+
+def search_alpha(train, model):
+    """
+    Reserva al azar un 10% de cada clase del conjunto de entrenamiento (el corpus está
+    ordenado por etiqueta), entrena con el resto, elige alpha entre ALPHA_GRID con
+    la parte reservada (sin reentrenar para cada valor) y después suma al modelo sus conteos
+    """
+    fit_docs, validation_docs = stratified_holdout(train.labels, 0.1)
+    fit_part = train.take(fit_docs)
+    validation = train.take(validation_docs)
+
+    print("\nEntrenando modelo Naive Bayes...")
+    start_train = time.time()
+    model.partial_fit_encoded(fit_part.words, fit_part.offsets, fit_part.ids, fit_part.labels)
+    print(f"Entrenamiento completado en {time.time() - start_train:.2f} segundos")
+
+    print(f"\nBuscando alpha con {len(validation)} documentos de validación...")
+    start = time.time()
+    model.tune_alpha(validation.token_lists(), validation.labels, ALPHA_GRID)
+    for alpha, accuracy in model.alpha_scores.items():
+        marker = "  <- mejor" if alpha == model.alpha else ""
+        print(f"  alpha={alpha:<6g} exactitud {accuracy:.4f}{marker}")
+    print(f"Búsqueda completada en {time.time() - start:.2f} segundos")
+
+    model.partial_fit_encoded(validation.words, validation.offsets, validation.ids, validation.labels)
+    return model
+
+def fit_dicts(X, y):
+    """
+    Entrenamiento de referencia con la implementación anterior basada en diccionarios
+    (vocabulario, conteos y una probabilidad por palabra y clase). Sólo se usa para
+    comparar tiempo y memoria con NaiveBayes.fit.
+    """
+    alpha = 1.0
+    classes = np.unique(y)
+    vocabulary = set()
+    for doc in X:
+        vocabulary.update(doc)
+
+    class_priors = {c: np.sum(y == c) / len(y) for c in classes}
+    word_counts = {c: defaultdict(int) for c in classes}
+    total_word_counts = {c: 0 for c in classes}
+    for doc, label in zip(X, y):
+        for word in doc:
+            word_counts[label][word] += 1
+            total_word_counts[label] += 1
+
+    feature_probs = {c: {} for c in classes}
+    for c in classes:
+        for word in vocabulary:
+            numerator = word_counts[c][word] + alpha
+            denominator = total_word_counts[c] + alpha * len(vocabulary)
+            feature_probs[c][word] = numerator / denominator
+    return class_priors, feature_probs
+
+def fit_counts(X, y):
+    model = NaiveBayes()
+    model.fit(X, y)
+    model._compile()
+    return model
+
+def _measure_in_process(fit_fn, X, y, queue):
+    rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    fit_fn(X, y)
+    elapsed = time.time() - start
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en KB en Linux
+    queue.put((elapsed, (rss_peak - rss_start) / 1024))
+
+def measure_training(fit_fn, X, y):
+    """
+    Mide el tiempo y el incremento del pico de RSS (MB) de un entrenamiento.
+    Se ejecuta en un proceso hijo para que cada medición parta del mismo estado.
+    """
+    if resource is None or 'fork' not in multiprocessing.get_all_start_methods():
+        start = time.time()
+        fit_fn(X, y)
+        return time.time() - start, None
+
+    ctx = multiprocessing.get_context('fork')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_measure_in_process, args=(fit_fn, X, y, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
 
+def compare_training(X_train, y_train):
+    print("\nComparando entrenamiento (anterior vs. conteos en arreglos)...")
+    for name, fit_fn in (("Diccionarios (anterior)", fit_dicts),
+                        ("Conteos NumPy (actual)", fit_counts)):
+        elapsed, rss = measure_training(fit_fn, X_train, y_train)
+        rss_text = f"{rss:.1f} MB" if rss is not None else "no disponible"
+        print(f"  {name}: {elapsed:.2f} s, pico de RSS adicional: {rss_text}")
+
+def describe_selection(min_count, top_k, criterion):
+    if top_k is None:
+        return f"min_count={min_count}"
+    return f"min_count={min_count}, top {top_k} por {criterion}"
+
+def apply_feature_selection(model, min_count, top_k, criterion):
+    mask = select_features(model.feature_counts, min_count, top_k, criterion)
+    vocab_size = len(model.vocabulary)
+    model.prune(mask)
+    # Se guarda con el modelo para que --update rechace los modelos podados
+    model.feature_selection = {'min_count': min_count, 'top_k': top_k, 'criterion': criterion}
+    print(f"Selección de características ({describe_selection(min_count, top_k, criterion)}): "
+          f"{vocab_size} -> {len(model.vocabulary)} palabras")
+    return model
+
+def compare_selection(model, test_batches):
+    """
+    Reporta, para cada configuración de SELECTION_CONFIGS, el tamaño del modelo
+    (binario y pickle), el tiempo de carga, la velocidad de puntuación con el modelo
+    binario y la exactitud sobre el conjunto de prueba
+    """
+    X_test = [doc for X_batch, _ in test_batches for doc in X_batch]
+    y_test = np.concatenate([y_batch for _, y_batch in test_batches])
+
+    print("\nComparando configuraciones de selección de características...")
+    print(f"  {'configuración':<36} {'palabras':>9} {'bin MB':>8} {'pkl MB':>8} "
+          f"{'carga bin':>10} {'carga pkl':>10} {'docs/s':>10} {'exactitud':>10}")
+    with tempfile.TemporaryDirectory() as workdir:
+        bin_path = os.path.join(workdir, 'model.bin')
+        pkl_path = os.path.join(workdir, 'model.pkl')
+        for min_count, top_k, criterion in SELECTION_CONFIGS:
+            mask = select_features(model.feature_counts, min_count, top_k, criterion)
+            pruned = copy.deepcopy(model).prune(mask)
+            export_model(pruned, bin_path)
+            with open(pkl_path, 'wb') as f:
+                pickle.dump(pruned, f)
+
+            start = time.perf_counter()
+            compiled = CompiledModel(bin_path)
+            load_bin = time.perf_counter() - start
+            start = time.perf_counter()
+            with open(pkl_path, 'rb') as f:
+                pickle.load(f)
+            load_pkl = time.perf_counter() - start
+
+            start = time.perf_counter()
+            y_pred = compiled.predict(X_test)
+            scoring = time.perf_counter() - start
+            accuracy = np.mean(y_pred == y_test)
+
+            print(f"  {describe_selection(min_count, top_k, criterion):<36} {len(pruned.vocabulary):>9} "
+                  f"{os.path.getsize(bin_path) / 1024 / 1024:>8.2f} "
+                  f"{os.path.getsize(pkl_path) / 1024 / 1024:>8.2f} "
+                  f"{load_bin * 1000:>8.1f}ms {load_pkl * 1000:>8.1f}ms "
+                  f"{len(X_test) / scoring:>10.0f} {accuracy:>10.4f}")
+            del compiled
+
+def update_model(dataset_path):
+    """
+    Incorpora nuevos tweets etiquetados (formato Sentiment140) al modelo guardado
+    sin reentrenar con todo el corpus. Los modelos podados con --min-count o --top-k
+    se rechazan: sus palabras descartadas volverían a entrar sólo con los conteos de
+    los tweets nuevos y el resultado ya no equivaldría a reentrenar.
+    """
+    with open('models/model.pkl', 'rb') as f:
+        model = pickle.load(f)
+    if getattr(model, 'feature_selection', None) is not None:
+        raise SystemExit(f"El modelo guardado tiene selección de características "
+                         f"({describe_selection(**model.feature_selection)}); --update sólo "
+                         f"admite modelos sin podar. Reentrena con los datos nuevos.")
+    with open('models/preprocessor.pkl', 'rb') as f:
+        preprocessor = pickle.load(f)
+
+    X_raw, y_raw = load_sentiment140_dataset(dataset_path)
+    X_clean, y_clean = preprocess_texts(X_raw, y_raw, preprocessor)
+
+    start = time.time()
+    model.partial_fit(X_clean, y_clean)
+    print(f"Modelo actualizado con {len(X_clean)} ejemplos en {time.time() - start:.2f} segundos")
+    print(f"Columnas: {model.feature_counts.shape[1]} | Documentos por clase: {model.class_counts}")
+
+    with open('models/model.pkl', 'wb') as f:
+        pickle.dump(model, f)
+    # La webapp y bulk_score.py prefieren el formato binario: exportarlo también
+    export_model(model, 'models/model.bin')
+
+def train_serial(dataset_path, preprocessor, model, args):
     X_raw, y_raw = load_sentiment140_dataset(dataset_path)
     X, y = balance_dataset(X_raw, y_raw)
 
     print("\nPreprocesando datos...")
-    preprocessor = Preprocessor()
     start_pre = time.time()
     X_clean, y_clean = preprocess_texts(X, y, preprocessor)
     print(f"Preprocesamiento completado en {time.time() - start_pre:.2f} segundos")
@@ -99,14 +577,112 @@ def main():
 
     print(f"Entrenamiento: {len(X_train)} | Prueba: {len(X_test)}")
 
+    if args.compare_training:
+        compare_training(X_train, y_train)
+
     print("\nEntrenando modelo Naive Bayes...")
     start_train = time.time()
-    model = NaiveBayes()
     model.fit(X_train, y_train)
     print(f"Entrenamiento completado en {time.time() - start_train:.2f} segundos")
+    return model, X_test, y_test
+
+def create_model(args):
+    """
+    Con --hashing las palabras se asignan a 2**BITS columnas por hash en lugar de
+    guardar el vocabulario, de modo que la memoria del modelo no crece con él
+    """
+    if args.hashing:
+        print(f"Usando hashing de características con {2 ** args.hashing} columnas")
+        return HashingNaiveBayes(n_features=2 ** args.hashing, alpha=args.alpha)
+    if args.ngrams > 1:
+        print(f"Usando n-gramas de hasta {args.ngrams} palabras")
+    return NaiveBayes(ngrams=args.ngrams, alpha=args.alpha)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Entrena el modelo Naive Bayes con Sentiment140")
+    parser.add_argument('--compare-training', action='store_true',
+                        help="Reporta tiempo y pico de RSS del entrenamiento anterior vs. el actual")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Número de procesos para cargar, preprocesar y contar el dataset")
+    parser.add_argument('--cache-dir', default='cache',
+                        help="Directorio de la caché del corpus preprocesado")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="No lee ni guarda la caché del corpus preprocesado")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Entrena por lotes sin cargar el corpus completo en memoria")
+    parser.add_argument('--update', metavar='CSV',
+                        help="Actualiza models/model.pkl con los tweets de este CSV en lugar de reentrenar")
+    parser.add_argument('--hashing', type=int, metavar='BITS',
+                        help="Usa hashing de características con 2**BITS columnas (por ejemplo 20)")
+    parser.add_argument('--ngrams', type=int, default=1, choices=[1, 2, 3],
+                        help="Longitud máxima de los n-gramas usados como características")
+    parser.add_argument('--alpha', type=float, default=1.0,
+                        help="Parámetro de suavizado de Laplace")
+    parser.add_argument('--search-alpha', action='store_true',
+                        help="Elige alpha con un 10%% del conjunto de entrenamiento reservado para validación")
+    parser.add_argument('--min-count', type=int, default=1,
+                        help="Descarta las palabras con menos apariciones en el corpus de entrenamiento")
+    parser.add_argument('--top-k', type=int,
+                        help="Conserva sólo las K palabras mejor puntuadas según --criterion")
+    parser.add_argument('--criterion', choices=CRITERIA, default='frequency',
+                        help="Puntuación usada por --top-k: frequency, chi2 o mi (información mutua)")
+    parser.add_argument('--cross-validation', type=int, metavar='K',
+                        help="Sólo evalúa el modelo con validación cruzada de K particiones (no guarda modelos)")
+    parser.add_argument('--compare-selection', action='store_true',
+                        help="Reporta tamaño, carga, velocidad y exactitud con varias selecciones de palabras")
+    args = parser.parse_args()
+    if args.hashing and args.ngrams > 1:
+        parser.error("--ngrams no se puede combinar con --hashing")
+    if args.hashing and (args.min_count > 1 or args.top_k is not None or args.compare_selection):
+        parser.error("--min-count, --top-k y --compare-selection no se pueden combinar con "
+                     "--hashing (las columnas son cubetas de hash compartidas)")
+    if args.top_k is not None and args.top_k < 1:
+        parser.error("--top-k debe ser al menos 1")
+    if args.min_count < 1:
+        parser.error("--min-count debe ser al menos 1")
+    if args.cross_validation is not None and args.cross_validation < 2:
+        parser.error("--cross-validation requiere al menos 2 particiones")
+    if args.alpha <= 0:
+        parser.error("--alpha debe ser positivo")
+    if args.search_alpha and args.streaming:
+        parser.error("--search-alpha no se puede combinar con --streaming")
+    if args.cross_validation and args.streaming:
+        parser.error("--cross-validation no se puede combinar con --streaming")
+    return args
+
+def main():
+    args = parse_args()
+    if args.update:
+        update_model(args.update)
+        return
+
+    dataset_path = '../dataset/training.1600000.processed.noemoticon.csv'
+    os.makedirs('models', exist_ok=True)
+    start_time_total = time.time()
+
+    preprocessor = Preprocessor()
+    model = create_model(args)
+    if args.cross_validation:
+        report_cross_validation(dataset_path, preprocessor, model, args)
+        return
+    if args.streaming:
+        model, test_batches = train_streaming(dataset_path, preprocessor, model)
+    elif args.workers > 1 or not args.no_cache or args.search_alpha:
+        corpus = get_corpus(dataset_path, preprocessor, args)
+        model, X_test, y_test = train_with_corpus(corpus, model, args)
+        test_batches = [(X_test, y_test)]
+    else:
+        model, X_test, y_test = train_serial(dataset_path, preprocessor, model, args)
+        test_batches = [(X_test, y_test)]
+
+    if args.compare_selection:
+        test_batches = list(test_batches)
+        compare_selection(model, test_batches)
+    if args.min_count > 1 or args.top_k is not None:
+        apply_feature_selection(model, args.min_count, args.top_k, args.criterion)
 
     print("\nEvaluando modelo...")
-    metrics, confusion = model.get_metrics(X_test, y_test)
+    metrics, confusion = evaluate_batches(model, test_batches)
 
     print("\nMétricas de evaluación:")
     for label in metrics:
@@ -121,6 +697,7 @@ def main():
     print("\nGuardando archivos...")
     with open('models/model.pkl', 'wb') as f:
         pickle.dump(model, f)
+    export_model(model, 'models/model.bin')
     with open('models/preprocessor.pkl', 'wb') as f:
         pickle.dump(preprocessor, f)
 
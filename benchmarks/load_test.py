@@ -0,0 +1,417 @@
+import argparse
+import http.client
+import importlib
+import itertools
+import json
+import os
+import pickle
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+WEBAPP = os.path.join(ROOT, 'webapp')
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, WEBAPP)
+
+from preprocessor import Preprocessor
+from naive_bayes import NaiveBayes
+from model_format import export_model
+from synthetic_corpus import generate_corpus
+from run_benchmarks import git_commit
+
+# Valores por defecto de cada configuración de servicio
+BASE_CONFIG = {
+    'server': 'werkzeug',    # werkzeug, gunicorn o wsgi (la aplicación en este mismo proceso)
+    'workers': 1,            # procesos del servidor (werkzeug crea uno por petición, hasta este máximo)
+    'threads': 16,           # hilos por proceso (werkzeug no los limita: 1 o "varios")
+    'endpoint': 'analyze',   # analyze o analyze_batch
+    'batch': 1,              # textos por petición en analyze_batch
+    'microbatch': 0,         # SENTIMENT_MICROBATCH
+    'cache': 10000,          # SENTIMENT_CACHE_SIZE
+}
+SERVERS = ('werkzeug', 'gunicorn', 'wsgi')
+
+
+def parse_config(spec):
+    """
+    Convierte una especificación "clave=valor,clave=valor" en una configuración completa.
+    Por ejemplo "workers=2,threads=1" o "endpoint=analyze_batch,batch=32".
+    """
+    config = dict(BASE_CONFIG)
+    for item in filter(None, spec.split(',')):
+        key, sep, value = item.partition('=')
+        if not sep or key not in config:
+            raise ValueError(f"Opción inválida {item!r}; las opciones son: {', '.join(config)}")
+        config[key] = value if isinstance(config[key], str) else int(value)
+    if config['server'] not in SERVERS:
+        raise ValueError(f"server debe ser uno de: {', '.join(SERVERS)}")
+    if config['endpoint'] not in ('analyze', 'analyze_batch'):
+        raise ValueError("endpoint debe ser analyze o analyze_batch")
+    if config['server'] == 'werkzeug' and config['workers'] > 1 and config['threads'] > 1:
+        raise ValueError("werkzeug no combina varios procesos con varios hilos; "
+                         "usa threads=1 o server=gunicorn")
+    if config['endpoint'] == 'analyze' and config['batch'] != 1:
+        raise ValueError("batch sólo se aplica a endpoint=analyze_batch")
+    config['spec'] = spec
+    config['name'] = spec or 'base'
+    return config
+
+
+def prepare_model(workdir, n_docs, seed):
+    """Entrena un modelo con un corpus sintético y lo guarda en formato binario"""
+    texts, labels = generate_corpus(n_docs, seed=seed + 1)
+    preprocessor = Preprocessor()
+    model = NaiveBayes().fit(preprocessor.preprocess_batch(texts), labels)
+
+    model_path = os.path.join(workdir, 'model.bin')
+    preprocessor_path = os.path.join(workdir, 'preprocessor.pkl')
+    export_model(model, model_path)
+    with open(preprocessor_path, 'wb') as f:
+        pickle.dump(preprocessor, f)
+    return model_path, preprocessor_path
+
+
+def environment(config, model_path, preprocessor_path):
+    """Variables de entorno con las que app.py lee la configuración"""
+    env = dict(os.environ)
+    env.update({
+        'SENTIMENT_MODEL_PATH': model_path,
+        'SENTIMENT_PREPROCESSOR_PATH': preprocessor_path,
+        'SENTIMENT_CACHE_SIZE': str(config['cache']),
+        'SENTIMENT_MICROBATCH': str(config['microbatch']),
+    })
+    return env
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def serve(port, config):
+    """Punto de entrada del proceso del servidor werkzeug (ver LocalServer)"""
+    from werkzeug.serving import run_simple
+    os.chdir(WEBAPP)
+    import app
+    run_simple('127.0.0.1', port, app.app, threaded=config['threads'] > 1,
+               processes=config['workers'] if config['threads'] <= 1 else 1)
+
+
+class LocalServer:
+    def __init__(self, config, model_path, preprocessor_path, timeout=60):
+        """
+        Inicia webapp/app.py en un proceso aparte (servidor de desarrollo de werkzeug o
+        gunicorn) y espera a que responda /status
+
+        config: configuración obtenida con parse_config
+        """
+        self.port = free_port()
+        env = environment(config, model_path, preprocessor_path)
+        if config['server'] == 'gunicorn':
+            if shutil.which('gunicorn') is None:
+                raise RuntimeError("gunicorn no está instalado (pip install gunicorn)")
+            command = ['gunicorn', '--workers', str(config['workers']),
+                       '--threads', str(config['threads']), '--bind', f'127.0.0.1:{self.port}',
+                       '--log-level', 'warning', 'app:app']
+        else:
+            command = [sys.executable, os.path.abspath(__file__), '--serve', str(self.port),
+                       '--config', config['spec']]
+        self.process = subprocess.Popen(command, cwd=WEBAPP, env=env,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self._wait(timeout)
+
+    def _wait(self, timeout):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"El servidor terminó con código {self.process.returncode}")
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=1)
+                conn.request('GET', '/status')
+                if json.loads(conn.getresponse().read()).get('model_loaded'):
+                    return
+            except (OSError, ValueError):
+                pass
+            time.sleep(0.2)
+        self.close()
+        raise RuntimeError("El servidor no respondió a tiempo")
+
+    def client(self):
+        return HTTPClient('127.0.0.1', self.port)
+
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HTTPClient:
+    def __init__(self, host, port, timeout=30):
+        """Cliente de un hilo: reutiliza la conexión mientras el servidor la mantenga abierta"""
+        self.conn = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def post(self, path, payload):
+        body = json.dumps(payload)
+        try:
+            self.conn.request('POST', path, body, {'Content-Type': 'application/json'})
+            response = self.conn.getresponse()
+            response.read()
+            if response.will_close:
+                self.conn.close()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            raise
+
+
+class InProcessApp:
+    def __init__(self, config, model_path, preprocessor_path):
+        """
+        Importa webapp/app.py en este proceso y la llama como WSGI con el cliente de
+        pruebas de Flask, sin red (mide la aplicación sin el costo del servidor HTTP)
+        """
+        os.environ.update(environment(config, model_path, preprocessor_path))
+        cwd = os.getcwd()
+        os.chdir(WEBAPP)
+        try:
+            # app.py lee la configuración al importarse
+            if 'app' in sys.modules:
+                self.module = importlib.reload(sys.modules['app'])
+            else:
+                self.module = importlib.import_module('app')
+        finally:
+            os.chdir(cwd)
+        if not self.module.model_loaded:
+            raise RuntimeError("La aplicación no pudo cargar el modelo")
+
+    def client(self):
+        return WSGIClient(self.module.app.test_client())
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class WSGIClient:
+    def __init__(self, client):
+        self.client = client
+
+    def post(self, path, payload):
+        return self.client.post(path, json=payload).status_code
+
+
+def generate_load(service, config, texts, concurrency, duration, warmup):
+    """
+    Envía peticiones desde concurrency hilos, cada uno con su cliente, durante warmup +
+    duration segundos (carga cerrada: cada hilo envía la siguiente petición al recibir
+    la respuesta). Los textos se toman en orden del corpus, que ya incluye duplicados.
+
+    Retorna (inicio de la medición, arreglo de registros) con una fila por petición
+    medida: instante de fin, latencia en segundos, 1 si tuvo éxito, número de textos
+    """
+    path = '/' + config['endpoint']
+    size = config['batch']
+    positions = itertools.count()
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+    records = [[] for _ in range(concurrency)]
+
+    def worker(out):
+        client = service.client()
+        while True:
+            # next() sobre itertools.count es atómico en CPython
+            first = next(positions) * size
+            batch = [texts[(first + i) % len(texts)] for i in range(size)]
+            payload = {'texts': batch} if path == '/analyze_batch' else {'text': batch[0]}
+            t0 = time.perf_counter()
+            if t0 >= stop_at:
+                return
+            try:
+                ok = client.post(path, payload) == 200
+            except Exception:
+                ok = False
+            t1 = time.perf_counter()
+            if t0 >= measure_from:
+                out.append((t1, t1 - t0, ok, size))
+
+    threads = [threading.Thread(target=worker, args=(out,), daemon=True) for out in records]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    rows = [row for out in records for row in out]
+    data = np.array(rows, dtype=np.float64).reshape(-1, 4)
+    return measure_from, data[np.argsort(data[:, 0], kind='stable')]
+
+
+def summarize(data, seconds):
+    """Rendimiento, latencias p50/p95/p99 y tasa de errores de un conjunto de peticiones"""
+    if len(data) == 0:
+        return {'requests': 0, 'requests_per_s': 0.0, 'texts_per_s': 0.0, 'error_rate': 0.0}
+    latencies = data[:, 1] * 1000
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'requests': int(len(data)),
+        'requests_per_s': len(data) / seconds,
+        'texts_per_s': float(data[:, 3].sum()) / seconds,
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'max_ms': float(latencies.max()),
+        'error_rate': float(1 - data[:, 2].mean()),
+    }
+
+
+def per_interval(data, measure_from, duration, interval):
+    """Resume las peticiones terminadas en cada intervalo de la medición"""
+    n_intervals = max(1, int(np.ceil(duration / interval)))
+    index = np.minimum(((data[:, 0] - measure_from) // interval).astype(np.int64), n_intervals - 1)
+    return [dict(summarize(data[index == i], interval), t=round((i + 1) * interval, 3))
+            for i in range(n_intervals)]
+
+
+def run_config(config, args, model_path, preprocessor_path, texts):
+    print(f"\nConfiguración {config['name']}: server={config['server']}, "
+          f"workers={config['workers']}, threads={config['threads']}, "
+          f"endpoint=/{config['endpoint']} (batch {config['batch']}), "
+          f"microbatch={config['microbatch']}, cache={config['cache']}, "
+          f"concurrency={args.concurrency}")
+    if config['server'] == 'wsgi':
+        service = InProcessApp(config, model_path, preprocessor_path)
+    else:
+        service = LocalServer(config, model_path, preprocessor_path)
+
+    with service:
+        measure_from, data = generate_load(service, config, texts, args.concurrency,
+                                           args.duration, args.warmup)
+
+    intervals = per_interval(data, measure_from, args.duration, args.interval)
+    print(f"  {'t (s)':>6} {'pet/s':>9} {'textos/s':>10} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'errores':>8}")
+    for row in intervals:
+        if not row['requests']:
+            print(f"  {row['t']:>6g} {0:>9.1f} {0:>10.1f} {'-':>8} {'-':>8} {'-':>8} {'-':>8}")
+            continue
+        print(f"  {row['t']:>6g} {row['requests_per_s']:>9.1f} {row['texts_per_s']:>10.1f} "
+              f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} "
+              f"{row['error_rate']:>8.2%}")
+
+    summary = summarize(data, args.duration)
+    return {'config': config, 'summary': summary, 'intervals': intervals}
+
+
+def print_comparison(results):
+    print("\nComparación de configuraciones:")
+    print(f"  {'configuración':<40} {'pet/s':>9} {'textos/s':>10} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'errores':>8}")
+    for result in results:
+        s = result['summary']
+        if not s['requests']:
+            print(f"  {result['config']['name']:<40} sin peticiones completadas")
+            continue
+        print(f"  {result['config']['name']:<40} {s['requests_per_s']:>9.1f} {s['texts_per_s']:>10.1f} "
+              f"{s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f} {s['error_rate']:>8.2%}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Prueba de carga de webapp/app.py con tráfico sintético a /analyze")
+    parser.add_argument('--config', action='append',
+                        help="Configuración a medir como clave=valor separados por comas "
+                             f"(opciones: {', '.join(BASE_CONFIG)}); se puede repetir "
+                             "para comparar varias")
+    parser.add_argument('--concurrency', type=int, default=16, help="Hilos cliente simultáneos")
+    parser.add_argument('--duration', type=float, default=10.0, help="Segundos de medición")
+    parser.add_argument('--warmup', type=float, default=2.0,
+                        help="Segundos iniciales que no se miden")
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help="Segundos de cada intervalo del reporte en el tiempo")
+    parser.add_argument('--texts', type=int, default=20000, help="Tamaño del corpus de tráfico")
+    parser.add_argument('--duplicate-rate', type=float, default=0.3,
+                        help="Proporción de textos repetidos en el tráfico (retweets, spam)")
+    parser.add_argument('--max-words', type=int, default=30,
+                        help="Máximo de palabras por tweet (la longitud varía entre 1 y este valor)")
+    parser.add_argument('--train-size', type=int, default=50000,
+                        help="Tweets sintéticos para entrenar el modelo servido")
+    parser.add_argument('--seed', type=int, default=0, help="Semilla del corpus sintético")
+    parser.add_argument('--output', help="Archivo JSON donde guardar los resultados")
+    parser.add_argument('--serve', type=int, metavar='PUERTO', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    try:
+        args.configs = [parse_config(spec) for spec in (args.config or [''])]
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def main():
+    args = parse_args()
+    if args.serve:
+        serve(args.serve, args.configs[0])
+        return
+
+    texts, _ = generate_corpus(args.texts, seed=args.seed, duplicate_rate=args.duplicate_rate,
+                               max_words=args.max_words)
+    lengths = np.array([len(text) for text in texts])
+    print(f"Tráfico: {len(texts)} tweets sintéticos ({args.duplicate_rate:.0%} duplicados), longitud "
+          f"p50 {np.percentile(lengths, 50):.0f} / p95 {np.percentile(lengths, 95):.0f} caracteres")
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"Entrenando el modelo servido con {args.train_size} tweets sintéticos...")
+        model_path, preprocessor_path = prepare_model(workdir, args.train_size, args.seed)
+        for config in args.configs:
+            try:
+                results.append(run_config(config, args, model_path, preprocessor_path, texts))
+            except RuntimeError as e:
+                print(f"  Se omite la configuración {config['name']}: {e}")
+
+    print_comparison(results)
+
+    if args.output:
+        report = {
+            'meta': {
+                'commit': git_commit(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'concurrency': args.concurrency,
+                'duration': args.duration,
+                'texts': args.texts,
+                'duplicate_rate': args.duplicate_rate,
+                'seed': args.seed,
+            },
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
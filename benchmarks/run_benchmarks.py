@@ -0,0 +1,289 @@
+import argparse
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, os.path.join(ROOT, 'webapp'))
+
+from preprocessor import Preprocessor
+from naive_bayes import NaiveBayes
+from model_format import export_model
+from inference import SentimentInference
+from synthetic_corpus import generate_corpus
+
+BATCH_SIZE = 1000
+
+
+def percentiles_ms(latencies):
+    latencies = np.asarray(latencies) * 1000
+    return float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99))
+
+
+def peak_memory_mb(fn):
+    """
+    Pico de memoria asignada (MB) durante fn, medido con tracemalloc en una ejecución
+    aparte para no afectar los tiempos
+    """
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def make_result(benchmark, size, n_items, elapsed, latencies=None, peak_mb=None, unit='docs'):
+    result = {
+        'benchmark': benchmark,
+        'size': size,
+        'items': n_items,
+        'seconds': elapsed,
+        'throughput': n_items / elapsed if elapsed > 0 else None,
+        'unit': f'{unit}/s',
+    }
+    if latencies is not None:
+        result['p50_ms'], result['p99_ms'] = percentiles_ms(latencies)
+    if peak_mb is not None:
+        result['peak_memory_mb'] = peak_mb
+    return result
+
+
+def timed_calls(fn, items):
+    """Llama fn con cada elemento y retorna (tiempo total, latencias individuales)"""
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        t = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - t)
+    return time.perf_counter() - start, latencies
+
+
+def batches(items, size=BATCH_SIZE):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def bench_preprocess(preprocessor, texts, size):
+    elapsed, latencies = timed_calls(preprocessor.preprocess, texts)
+    peak = peak_memory_mb(lambda: preprocessor.preprocess_batch(texts))
+    yield make_result('preprocess', size, len(texts), elapsed, latencies, peak)
+
+    elapsed, latencies = timed_calls(preprocessor.preprocess_batch, batches(texts))
+    yield make_result('preprocess_batch', size, len(texts), elapsed, latencies)
+
+
+def bench_fit(X, y, size, repeat):
+    elapsed = min(timed_calls(lambda _: NaiveBayes().fit(X, y), range(repeat))[1])
+    peak = peak_memory_mb(lambda: NaiveBayes().fit(X, y))
+    yield make_result('fit', size, len(X), elapsed, peak_mb=peak)
+
+
+def bench_predict_proba(model, X, size):
+    model.predict_proba_matrix(X[:10])  # compilar las log-probabilidades antes de medir
+    elapsed, latencies = timed_calls(model.predict_proba, batches(X))
+    peak = peak_memory_mb(lambda: model.predict_proba(X))
+    yield make_result('predict_proba', size, len(X), elapsed, latencies, peak)
+    # ruta para lotes: la matriz de probabilidades sin construir un dict por documento
+    elapsed, latencies = timed_calls(model.predict_proba_matrix, batches(X))
+    peak = peak_memory_mb(lambda: model.predict_proba_matrix(X))
+    yield make_result('predict_proba_matrix', size, len(X), elapsed, latencies, peak)
+
+
+def model_memory_mb(model):
+    """Memoria ocupada por los arreglos de conteos y log-probabilidades del modelo"""
+    arrays = (model.feature_counts, model.ngram_counts, model.ngram_keys, model.log_probs,
+              model.log_odds)
+    return sum(a.nbytes for a in arrays if a is not None) / 1024 / 1024
+
+
+def bench_ngrams(X_train, y_train, X_test, size, ngrams):
+    # Entrenamiento y puntuación con palabras, bigramas y trigramas
+    for n in ngrams:
+        elapsed = timed_calls(lambda _: NaiveBayes(ngrams=n).fit(X_train, y_train), [None])[0]
+        peak = peak_memory_mb(lambda: NaiveBayes(ngrams=n).fit(X_train, y_train))
+        model = NaiveBayes(ngrams=n).fit(X_train, y_train)
+        model.predict_proba_matrix(X_test[:10])
+
+        result = make_result(f'fit_ngrams{n}', size, len(X_train), elapsed, peak_mb=peak)
+        result['features'] = len(model.vocabulary) + len(model.ngram_keys)
+        result['model_memory_mb'] = model_memory_mb(model)
+        yield result
+
+        elapsed, latencies = timed_calls(model.predict_proba_matrix, batches(X_test))
+        yield make_result(f'predict_ngrams{n}', size, len(X_test), elapsed, latencies)
+
+
+def bench_inference(engine, texts, size, max_requests):
+    sample = texts[:max_requests]
+    elapsed, latencies = timed_calls(engine.predict, sample)
+    yield make_result('inference_predict', size, len(sample), elapsed, latencies)
+
+    elapsed, latencies = timed_calls(engine.analyze_batch, batches(texts))
+    yield make_result('inference_analyze_batch', size, len(texts), elapsed, latencies)
+
+
+def bench_http(app_module, engine, texts, size, max_requests):
+    # Reemplazar el motor cargado por la aplicación por el del tamaño actual
+    app_module.inference_engine = engine
+    app_module.model_loaded = True
+    client = app_module.app.test_client()
+
+    sample = texts[:max_requests]
+
+    def post(text):
+        response = client.post('/analyze', json={'text': text})
+        if response.status_code != 200:
+            raise RuntimeError(f"/analyze respondió {response.status_code}")
+
+    elapsed, latencies = timed_calls(post, sample)
+    yield make_result('http_analyze', size, len(sample), elapsed, latencies, unit='requests')
+
+
+def import_app(model_path, preprocessor_path):
+    """Importa webapp/app.py apuntando a un modelo temporal; retorna None si falta Flask"""
+    os.environ['SENTIMENT_MODEL_PATH'] = model_path
+    os.environ['SENTIMENT_PREPROCESSOR_PATH'] = preprocessor_path
+    os.environ.setdefault('SENTIMENT_CACHE_SIZE', '0')
+    try:
+        import app
+    except ImportError as e:
+        print(f"Se omite el benchmark HTTP: {e}")
+        return None
+    return app
+
+
+def run_size(size, args, workdir, app_state):
+    texts, labels = generate_corpus(size, seed=args.seed)
+    preprocessor = Preprocessor()
+    results = list(bench_preprocess(preprocessor, texts, size))
+
+    X = preprocessor.preprocess_batch(texts)
+    y = np.array(labels)
+    split = int(len(X) * 0.8)
+    results += bench_fit(X[:split], y[:split], size, args.repeat)
+
+    model = NaiveBayes().fit(X[:split], y[:split])
+    results += bench_predict_proba(model, X[split:], size)
+    results += bench_ngrams(X[:split], y[:split], X[split:], size, args.ngrams)
+
+    model_path = os.path.join(workdir, f'model-{size}.bin')
+    preprocessor_path = os.path.join(workdir, 'preprocessor.pkl')
+    export_model(model, model_path)
+    with open(preprocessor_path, 'wb') as f:
+        pickle.dump(preprocessor, f)
+
+    # Sin caché, para medir el preprocesamiento y la puntuación de cada petición
+    engine = SentimentInference(model_path, preprocessor_path, cache_size=0)
+    test_texts = texts[split:]
+    results += bench_inference(engine, test_texts, size, args.max_requests)
+
+    if 'app' not in app_state:
+        app_state['app'] = import_app(model_path, preprocessor_path)
+    if app_state['app'] is not None:
+        results += bench_http(app_state['app'], engine, test_texts, size, args.max_requests)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Imprime la variación de rendimiento respecto a un archivo de resultados anterior"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r['benchmark'], r['size']): r for r in json.load(f)['results']}
+
+    print(f"\nComparación con {baseline_path}:")
+    for result in results:
+        previous = baseline.get((result['benchmark'], result['size']))
+        if previous is None or not previous.get('throughput') or not result.get('throughput'):
+            continue
+        ratio = result['throughput'] / previous['throughput']
+        line = f"  {result['benchmark']:<24} n={result['size']:<8} rendimiento x{ratio:.2f}"
+        if 'p99_ms' in result and 'p99_ms' in previous:
+            line += f" | p99 {previous['p99_ms']:.3f} -> {result['p99_ms']:.3f} ms"
+        print(line)
+
+
+def print_results(results):
+    for r in results:
+        line = f"  {r['benchmark']:<24} n={r['size']:<8} {r['throughput']:>12.1f} {r['unit']}"
+        if 'p50_ms' in r:
+            line += f" | p50 {r['p50_ms']:.3f} ms | p99 {r['p99_ms']:.3f} ms"
+        if 'peak_memory_mb' in r:
+            line += f" | pico {r['peak_memory_mb']:.1f} MB"
+        if 'features' in r:
+            line += f" | {r['features']} características, modelo {r['model_memory_mb']:.1f} MB"
+        print(line)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmarks del analizador de sentimientos")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="Tamaños del corpus sintético")
+    parser.add_argument('--seed', type=int, default=0, help="Semilla del corpus sintético")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Repeticiones del entrenamiento (se reporta la más rápida)")
+    parser.add_argument('--max-requests', type=int, default=2000,
+                        help="Máximo de peticiones individuales por tamaño")
+    parser.add_argument('--ngrams', type=int, nargs='*', default=[1, 2, 3],
+                        help="Longitudes de n-gramas a comparar (vacío para omitirlas)")
+    parser.add_argument('--output', help="Archivo JSON de resultados "
+                                         "(por defecto benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', metavar='JSON', help="Resultados anteriores para comparar")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    commit = git_commit()
+
+    results = []
+    app_state = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            print(f"\nCorpus sintético de {size} tweets...")
+            size_results = run_size(size, args, workdir, app_state)
+            print_results(size_results)
+            results += size_results
+
+    report = {
+        'meta': {
+            'commit': commit,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"{commit or 'resultados'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados guardados en {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import csv
+import random
+
+# Palabras con carga de sentimiento y palabras neutras frecuentes en tweets
+POSITIVE_WORDS = [
+    'love', 'great', 'amazing', 'happy', 'awesome', 'best', 'fun', 'good', 'nice', 'thanks',
+    'lol', 'beautiful', 'cool', 'excited', 'glad', 'wonderful', 'yay', 'enjoy', 'perfect', 'haha'
+]
+NEGATIVE_WORDS = [
+    'hate', 'sad', 'terrible', 'bad', 'awful', 'worst', 'sick', 'tired', 'miss', 'cry',
+    'broken', 'angry', 'sucks', 'hurts', 'boring', 'ugh', 'sorry', 'lost', 'fail', 'stupid'
+]
+NEUTRAL_WORDS = [
+    'today', 'work', 'going', 'day', 'time', 'home', 'night', 'phone', 'people', 'back',
+    'really', 'still', 'think', 'know', 'soon', 'morning', 'school', 'week', 'tomorrow', 'watching',
+    'friends', 'weekend', 'movie', 'music', 'twitter', 'sleep', 'coffee', 'house', 'game', 'new'
+]
+STOPWORDS = ['i', 'the', 'to', 'a', 'my', 'and', 'is', 'it', 'in', 'for', 'of', 'not', 'no', "don't"]
+
+
+def _rare_word(rng):
+    # Palabras poco frecuentes: errores de escritura, alargamientos y jerga
+    kind = rng.random()
+    if kind < 0.4:
+        return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 9)))
+    if kind < 0.7:
+        word = rng.choice(POSITIVE_WORDS + NEGATIVE_WORDS + NEUTRAL_WORDS)
+        return word[:-1] + word[-1] * rng.randint(2, 6)
+    return rng.choice(NEUTRAL_WORDS) + str(rng.randint(0, 999))
+
+
+def generate_tweet(rng, label, max_words=20):
+    """
+    Genera un tweet sintético con la mezcla típica de Sentiment140: menciones, enlaces,
+    hashtags, "RT", números, puntuación y palabras con carga de sentimiento
+    """
+    sentiment_words = POSITIVE_WORDS if label == 1 else NEGATIVE_WORDS
+    words = []
+    for _ in range(rng.randint(1, max_words)):
+        draw = rng.random()
+        if draw < 0.25:
+            words.append(rng.choice(STOPWORDS))
+        elif draw < 0.45:
+            words.append(rng.choice(sentiment_words))
+        elif draw < 0.50:
+            words.append(rng.choice(NEGATIVE_WORDS if label == 1 else POSITIVE_WORDS))
+        elif draw < 0.85:
+            words.append(rng.choice(NEUTRAL_WORDS))
+        else:
+            words.append(_rare_word(rng))
+
+    if rng.random() < 0.3:
+        words.insert(0, f'@user{rng.randint(0, 50000)}')
+    if rng.random() < 0.05:
+        words.insert(0, 'RT')
+    if rng.random() < 0.1:
+        words.append(f'http://t.co/{rng.randint(0, 10**9):x}')
+    if rng.random() < 0.1:
+        words.append(f'#{rng.choice(NEUTRAL_WORDS)}{rng.randint(0, 99)}')
+    if rng.random() < 0.3:
+        k = rng.randrange(len(words))
+        words[k] = words[k].upper()
+    return ' '.join(words) + rng.choice(['', '', '!', '!!', '...', '?', ' :)', ' :('])
+
+
+def generate_corpus(n, seed=0, duplicate_rate=0.0, max_words=20):
+    """
+    Genera n tweets sintéticos balanceados
+
+    n: número de tweets
+    seed: semilla para que el corpus sea reproducible
+    duplicate_rate: proporción de tweets que repiten uno anterior (retweets, spam)
+    max_words: número máximo de palabras por tweet
+
+    Retorna (textos, etiquetas) con etiquetas 0 (negativo) y 1 (positivo)
+    """
+    rng = random.Random(seed)
+    texts, labels = [], []
+    for i in range(n):
+        if texts and rng.random() < duplicate_rate:
+            j = rng.randrange(len(texts))
+            texts.append(texts[j])
+            labels.append(labels[j])
+            continue
+        label = i % 2
+        texts.append(generate_tweet(rng, label, max_words))
+        labels.append(label)
+    return texts, labels
+
+
+def write_sentiment140_csv(path, n, seed=0):
+    """
+    Escribe un CSV sintético con el formato de Sentiment140 (negativos primero y
+    luego positivos, como en el archivo original)
+    """
+    texts, labels = generate_corpus(n, seed)
+    rows = sorted(zip(labels, texts), key=lambda row: row[0])
+    with open(path, 'w', encoding='latin-1', errors='replace', newline='') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        for i, (label, text) in enumerate(rows):
+            writer.writerow([4 if label == 1 else 0, 1467810000 + i, 'Mon Apr 06 22:19:45 PDT 2009',
+                             'NO_QUERY', f'user{i}', text])
@@ -1,64 +1,207 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, g, Response
 import sys
 import os
 import csv
+import hmac
+import json
 import random
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 # Agrega el backend al sys.path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
 from inference import SentimentInference
+from batching import MicroBatcher
+from metrics import SentimentMetrics
+from reloading import ModelReloader
 
 app = Flask(__name__)
 
+# Instrumentación para /metrics (SENTIMENT_METRICS=0 la desactiva)
+metrics = SentimentMetrics() if os.environ.get('SENTIMENT_METRICS', '1') != '0' else None
+
+# Ruta del modelo: se prefiere el formato binario (mapeado en memoria y compartido
+# entre procesos) y, si no existe, el pickle
+DEFAULT_MODEL_PATHS = ['../backend/models/model.bin', '../backend/models/model.pkl']
+
+def default_model_path():
+    if os.path.exists(DEFAULT_MODEL_PATHS[0]):
+        return DEFAULT_MODEL_PATHS[0]
+    return DEFAULT_MODEL_PATHS[1]
+
+def model_path():
+    # Se resuelve en cada carga: si model.bin aparece después de iniciar, la recarga lo usa
+    return os.environ.get('SENTIMENT_MODEL_PATH') or default_model_path()
+
+PREPROCESSOR_PATH = os.environ.get('SENTIMENT_PREPROCESSOR_PATH', '../backend/models/preprocessor.pkl')
+
+def create_engine():
+    return SentimentInference(
+        model_path=model_path(),
+        preprocessor_path=PREPROCESSOR_PATH,
+        cache_size=int(os.environ.get('SENTIMENT_CACHE_SIZE', 10000)),
+        metrics=metrics
+    )
+
 # Cargar modelo
 try:
-    inference_engine = SentimentInference(
-        model_path='../backend/models/model.pkl',
-        preprocessor_path='../backend/models/preprocessor.pkl'
-    )
+    inference_engine = create_engine()
     model_loaded = True
 except Exception as e:
     print(f"Error al cargar el modelo: {e}")
+    inference_engine = None
     model_loaded = False
 
-def get_examples_from_dataset(dataset_path, num_examples=3):
-    examples = {"positivo": [], "negativo": []}
+# Recarga en caliente: el motor nuevo se carga y se valida en segundo plano y se publica
+# reemplazando la variable global, así que cada petición usa un motor completo (el que
+# leyó al empezar) y ninguna espera a la carga
+def load_validated_engine():
+    engine = create_engine()
+    engine.validate()
+    return engine
+
+def swap_engine(engine):
+    global inference_engine, model_loaded
+    inference_engine = engine
+    model_loaded = True
+    print(f"Modelo recargado: versión {engine.model_version}")
+
+def record_reload(result):
+    if metrics is not None:
+        metrics.reloads.inc(result='ok' if result['success'] else 'error')
+
+# SENTIMENT_RELOAD_INTERVAL > 0 vigila los archivos del modelo y los recarga al cambiar
+# (en cada proceso del servidor); SENTIMENT_ADMIN_TOKEN habilita POST /admin/reload, que
+# recarga sólo el proceso que recibe la petición
+ADMIN_TOKEN = os.environ.get('SENTIMENT_ADMIN_TOKEN', '')
+reloader = ModelReloader(
+    load_validated_engine, swap_engine,
+    watch_paths=([os.environ['SENTIMENT_MODEL_PATH']] if os.environ.get('SENTIMENT_MODEL_PATH')
+                 else DEFAULT_MODEL_PATHS) + [PREPROCESSOR_PATH],
+    interval=float(os.environ.get('SENTIMENT_RELOAD_INTERVAL', 0)),
+    on_result=record_reload
+)
+
+if metrics is not None:
+    metrics.add_gauge('sentiment_model_loaded', 'Si el modelo está cargado (1) o no (0)',
+                      lambda: int(model_loaded))
+    for field in ('size', 'hits', 'misses', 'evictions'):
+        metrics.add_gauge(f'sentiment_cache_{field}', f'Caché de predicciones: {field}',
+                          lambda field=field: inference_engine.cache.stats()[field] if model_loaded else 0)
+
+@app.before_request
+def start_timer():
+    g.start_time = time.perf_counter()
+    # El hilo de vigilancia se inicia en la primera petición de cada proceso
+    reloader.ensure_watching()
+
+@app.after_request
+def record_request(response):
+    if metrics is not None and 'start_time' in g:
+        endpoint = request.endpoint or 'desconocido'
+        metrics.request_seconds.observe(time.perf_counter() - g.start_time, endpoint=endpoint)
+        metrics.requests.inc(endpoint=endpoint, status=str(response.status_code))
+        if response.status_code >= 400:
+            metrics.errors.inc(endpoint=endpoint)
+    return response
+
+def json_response(payload):
+    """jsonify midiendo el tiempo de serialización"""
+    if metrics is None:
+        return jsonify(payload)
+    start = time.perf_counter()
+    response = jsonify(payload)
+    metrics.stage_seconds.observe(time.perf_counter() - start, stage='serialize')
+    return response
+
+# Modo de micro-lotes: las peticiones concurrentes a /analyze se agrupan durante una
+# ventana corta y se analizan juntas (requiere un servidor con varios hilos). El hilo
+# del lote se inicia en la primera petición de cada proceso, así que también funciona
+# con servidores que crean procesos con fork después de importar la aplicación.
+BATCH_TIMEOUT = float(os.environ.get('SENTIMENT_BATCH_TIMEOUT', 10))
+batcher = None
+if os.environ.get('SENTIMENT_MICROBATCH', '0') == '1':
+    # Se crea aunque el modelo no haya cargado: la función lee la variable global en
+    # cada lote, así que usa el motor cargado más tarde por una recarga
+    batcher = MicroBatcher(
+        lambda texts: inference_engine.analyze_batch(texts),
+        max_wait=float(os.environ.get('SENTIMENT_BATCH_WAIT_MS', 2)) / 1000,
+        max_batch=int(os.environ.get('SENTIMENT_BATCH_MAX', 256))
+    )
+
+DATASET_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'dataset', 'training.1600000.processed.noemoticon.csv'))
+
+def scan_example_pool(dataset_path, pool_size=50):
+    """
+    Recorre el dataset una vez y reúne hasta pool_size tweets negativos (del inicio) y
+    positivos (después de la fila 800,000) de longitud adecuada para mostrar como ejemplos
+    """
+    pool = {"positivo": [], "negativo": []}
+    with open(dataset_path, 'r', encoding='latin-1') as file:
+        reader = csv.reader(file)
+        count = 0
+        for row in reader:
+            try:
+                sentiment = int(row[0].strip('"'))
+                tweet_text = row[5]
+                if sentiment == 0 and 20 <= len(tweet_text) <= 140 and len(pool["negativo"]) < pool_size:
+                    pool["negativo"].append(tweet_text)
+                if count > 800000 and sentiment == 4 and 20 <= len(tweet_text) <= 140:
+                    pool["positivo"].append(tweet_text)
+                    if len(pool["positivo"]) >= pool_size:
+                        break
+                count += 1
+                if len(pool["negativo"]) >= pool_size and count < 800000:
+                    for _ in range(800000 - count):
+                        next(reader)
+                    count = 800000
+            except:
+                pass
+    return pool
+
+def load_example_pool(dataset_path):
+    """
+    Carga el conjunto de ejemplos desde el archivo auxiliar <dataset>.examples.json si
+    corresponde a la versión actual del dataset; si no, lo construye y lo guarda
+    """
+    sidecar_path = dataset_path + '.examples.json'
     try:
-        with open(dataset_path, 'r', encoding='latin-1') as file:
-            reader = csv.reader(file)
-            positive_tweets = []
-            negative_tweets = []
-            count = 0
-            for row in reader:
-                try:
-                    sentiment = int(row[0].strip('"'))
-                    tweet_text = row[5]
-                    if sentiment == 0 and 20 <= len(tweet_text) <= 140 and len(negative_tweets) < 50:
-                        negative_tweets.append(tweet_text)
-                    if count > 800000 and sentiment == 4 and 20 <= len(tweet_text) <= 140:
-                        positive_tweets.append(tweet_text)
-                        if len(positive_tweets) >= 50:
-                            break
-                    count += 1
-                    if len(negative_tweets) >= 50 and count < 800000:
-                        for _ in range(800000 - count):
-                            next(reader)
-                        count = 800000
-                except:
-                    pass
-            if positive_tweets:
-                examples["positivo"] = random.sample(positive_tweets, min(num_examples, len(positive_tweets)))
-            if negative_tweets:
-                examples["negativo"] = random.sample(negative_tweets, min(num_examples, len(negative_tweets)))
-        return examples
-    except:
-        return examples
+        stat = os.stat(dataset_path)
+    except OSError:
+        return {"positivo": [], "negativo": []}
+    source = {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    try:
+        with open(sidecar_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('source') == source:
+            return cached['examples']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    try:
+        pool = scan_example_pool(dataset_path)
+    except Exception as e:
+        print(f"Error al leer ejemplos del dataset: {e}")
+        return {"positivo": [], "negativo": []}
+
+    try:
+        with open(sidecar_path, 'w', encoding='utf-8') as f:
+            json.dump({'source': source, 'examples': pool}, f, ensure_ascii=False)
+    except OSError:
+        pass
+    return pool
+
+# Los ejemplos se leen una sola vez al iniciar; cada visita sólo toma una muestra
+example_pool = load_example_pool(DATASET_PATH)
+
+def get_examples(num_examples=3):
+    return {label: random.sample(tweets, min(num_examples, len(tweets)))
+            for label, tweets in example_pool.items()}
 
 @app.route('/')
 def index():
-    dataset_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'dataset', 'training.1600000.processed.noemoticon.csv'))
-    examples = get_examples_from_dataset(dataset_path)
-    return render_template('index.html', model_status=model_loaded, examples=examples)
+    return render_template('index.html', model_status=model_loaded, examples=get_examples())
 
 @app.route('/analyze', methods=['POST'])
 def analyze():
@@ -70,8 +213,14 @@ def analyze():
         return jsonify({'error': 'Texto inválido'}), 400
 
     try:
-        result = inference_engine.predict(data['text'])
-        return jsonify({
+        if batcher is not None:
+            try:
+                result = batcher.submit(data['text']).result(timeout=BATCH_TIMEOUT)
+            except FutureTimeoutError:
+                return jsonify({'error': 'El análisis no terminó a tiempo'}), 503
+        else:
+            result = inference_engine.predict(data['text'])
+        return json_response({
             'success': True,
             'prediction': result['prediction'],
             'confidence': result['confidence'],
@@ -80,9 +229,70 @@ def analyze():
     except Exception as e:
         return jsonify({'error': f'Error en predicción: {str(e)}'}), 500
 
+# Tamaño máximo de un lote en /analyze_batch
+MAX_BATCH_SIZE = int(os.environ.get('SENTIMENT_MAX_BATCH', 10000))
+
+@app.route('/analyze_batch', methods=['POST'])
+def analyze_batch():
+    if not model_loaded:
+        return jsonify({'error': 'Modelo no cargado.'}), 500
+
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('texts'), list) or not data['texts']:
+        return jsonify({'error': 'Se esperaba una lista no vacía en "texts"'}), 400
+    if len(data['texts']) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'El lote supera el máximo de {MAX_BATCH_SIZE} textos'}), 400
+
+    # Los textos inválidos reciben un error individual; el resto se analiza en un solo lote
+    texts = data['texts']
+    valid = [i for i, text in enumerate(texts) if isinstance(text, str) and text.strip()]
+
+    try:
+        predictions = inference_engine.analyze_batch([texts[i] for i in valid])
+    except Exception as e:
+        return jsonify({'error': f'Error en predicción: {str(e)}'}), 500
+
+    results = [{'error': 'Texto inválido'}] * len(texts)
+    for i, result in zip(valid, predictions):
+        results[i] = {
+            'prediction': result['prediction'],
+            'confidence': result['confidence'],
+            'probabilities': result['probabilities']
+        }
+    return json_response({'success': True, 'results': results})
+
 @app.route('/status')
 def status():
-    return jsonify({'model_loaded': model_loaded})
+    engine = inference_engine
+    response = {'model_loaded': model_loaded, 'reload': reloader.status()}
+    if engine is not None:
+        response['model'] = engine.info()
+        response['cache'] = engine.cache.stats()
+    return jsonify(response)
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Recarga deshabilitada (define SENTIMENT_ADMIN_TOKEN)'}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({'error': 'Token inválido'}), 403
+    if not reloader.reload():
+        return jsonify({'error': 'Ya hay una recarga en curso'}), 409
+
+    # Con ?wait=1 se responde al terminar la recarga, con su resultado
+    if request.args.get('wait') == '1':
+        reloader.wait()
+        result = reloader.last_result
+        if not result['success']:
+            return jsonify({'error': result['error'], 'reload': result}), 500
+        return jsonify({'success': True, 'reload': result, 'model': inference_engine.info()})
+    return jsonify({'success': True, 'status': 'recargando'}), 202
+
+@app.route('/metrics')
+def metrics_endpoint():
+    if metrics is None:
+        return jsonify({'error': 'Métricas desactivadas (SENTIMENT_METRICS=0)'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 #if __name__ == '__main__':
 #    app.run(debug=True)